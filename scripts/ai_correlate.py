@@ -1,10 +1,19 @@
 # scripts/ai_correlate.py
-import os, sys, json, re, argparse, time
+import os, sys, json, re, argparse, time, random, threading, hashlib, sqlite3, math, mmap, contextlib
+import cProfile, pstats
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterable
+from xml.sax.saxutils import escape as xml_escape
 import orjson
 from tqdm import tqdm
 
+from catalogue import load_catalogue
+from findings import Finding, FindingSet, from_mobsf, from_sarif, from_sast_json, from_trivy, iter_mobsf_issues
+from findings_store import FindingsStore
+from reports_io import MOBSF_SKIP_SECTIONS, ReportIndex, iter_items, iter_sections
+
 # OpenAI 1.x (opcional)
 USE_OPENAI = False
 try:
@@ -13,9 +22,16 @@ try:
 except Exception:
     USE_OPENAI = False
 
+try:
+    import resource  # no disponible en Windows
+except ImportError:
+    resource = None
+
 # DOCX
 from docx import Document
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
 
 CODE_EXT = {".kt",".java",".xml",".gradle",".kts",".properties",".json",".yml",".yaml"}
 
@@ -44,113 +60,462 @@ def load_json_any(path: Path) -> Optional[Any]:
         except Exception:
             return None
 
-def find_files(root: Path, patterns: List[str]) -> List[Path]:
-    out: List[Path] = []
-    for pat in patterns:
-        out.extend(root.rglob(pat))
-    # quitar duplicados conservando orden
-    seen = set(); res=[]
-    for p in out:
-        if p.resolve() not in seen:
-            seen.add(p.resolve()); res.append(p)
-    return res
-
-def load_requirements(req_path: Path) -> List[Dict[str, Any]]:
-    raw = load_json_any(req_path)
-    if isinstance(raw, dict) and "requirements" in raw:
-        data = raw["requirements"]
-    else:
-        data = raw if isinstance(raw, list) else []
-    out = []
-    for i, d in enumerate(data, 1):
-        if not isinstance(d, dict): 
-            continue
-        puid = d.get("PUID") or d.get("puid") or d.get("id") or f"REQ-{i:04d}"
-        # prioridad a "Requirement description"
-        text = (d.get("Requirement description") or d.get("Requirement") or
-                d.get("requirement") or d.get("controles") or
-                d.get("description") or d.get("Description") or
-                d.get("text") or d.get("Text") or "")
-        if not str(text).strip():
-            # fallback concatenado corto
-            text = " ".join([str(v) for v in d.values() if isinstance(v, (str,int,float))])[:2000]
-        out.append({"id": str(puid).strip(), "text": str(text).strip(), "raw": d})
-    return out
+def load_requirements(req_path: Path, cache_dir: Optional[Path] = None) -> List[Dict[str, Any]]:
+    # catálogo compilado y normalizado una sola vez (compartido con recolectar_datos.py)
+    cache = (cache_dir / "catalogue.sqlite") if cache_dir else None
+    return load_catalogue(req_path, cache).requirements()
 
-def summarize_trivy(reports_dir: Path) -> Dict[str, Any]:
+# Topes de ingesta: se aplican mientras se lee, sin materializar el informe completo
+MAX_TRIVY_FINDINGS = 5000
+MAX_MOBSF_FINDINGS = 2000
+MAX_SAST_FINDINGS = 5000
+
+def summarize_trivy(reports: ReportIndex, limit: int = MAX_TRIVY_FINDINGS,
+                    found: Optional[FindingSet] = None) -> Dict[str, Any]:
+    found = FindingSet() if found is None else found
     # prefer payload enriquecido
-    cand = find_files(reports_dir, ["agent_payload.json","trivy.json"])
-    js = load_json_any(cand[0]) if cand else {}
+    js = load_json_any(reports.first("agent_payload"))
     if isinstance(js, dict) and "summary" in js:
+        for v in (js.get("findings") if isinstance(js.get("findings"), list) else [])[:limit]:
+            if isinstance(v, dict) and "id" in v:
+                found.add(from_trivy(v))
         return js
-    if isinstance(js, dict) and "Results" in js:
-        return {"findings": js.get("Results"), "summary": {"source": "trivy.json"}}
-    return {}
+    src = reports.first("trivy") or (reports.first("agent_payload") if isinstance(js, dict) and "Results" in js else None)
+    if not src:
+        return {}
+    findings: List[Finding] = []
+    sev: Counter = Counter()
+    total = 0
+    for ctx, v in iter_items(src, "Results.item.Vulnerabilities.item", {"target": "Results.item.Target"}):
+        if not isinstance(v, dict):
+            continue
+        total += 1
+        sev[str(v.get("Severity") or "UNKNOWN").upper()] += 1
+        if len(findings) < limit:
+            f = from_trivy(v, ctx.get("target",""))
+            if found.add(f):
+                findings.append(f)
+    return {"findings": findings,
+            "summary": {"source": src.name, "vulnerabilities": total, "severity_counts": dict(sev)}}
 
-def summarize_mobsf(reports_dir: Path) -> Dict[str, Any]:
+def summarize_mobsf(reports: ReportIndex, limit: int = MAX_MOBSF_FINDINGS,
+                    found: Optional[FindingSet] = None) -> Dict[str, Any]:
+    found = FindingSet() if found is None else found
     out: Dict[str, Any] = {}
-    static = None; dynamic = None
-    cand = find_files(reports_dir, ["*mobsf*static*.json","*mobsf*results*.json","*mobsf*report*.json","*report_json*.json"])
-    if cand:
-        static = load_json_any(cand[0])
-    cand2 = find_files(reports_dir, ["*mobsf*dynamic*.json"])
-    if cand2:
-        dynamic = load_json_any(cand2[0])
     sev = {"CRITICAL":0,"HIGH":0,"MEDIUM":0,"LOW":0,"INFO":0}
-    if isinstance(static, dict):
-        try:
-            # intenta recorrer listas con 'severity' o 'Severity'
-            for v in static.values():
-                if isinstance(v, list):
-                    for it in v:
-                        s = (it.get("severity") or it.get("Severity") or "").upper()
+    findings: List[Finding] = []
+    has = {"static": False, "dynamic": False}
+    for kind in ("static", "dynamic"):
+        path = reports.first(f"mobsf_{kind}")
+        # secciones pesadas (strings, listados de ficheros...) se saltan sin construirlas
+        for key, section in (iter_sections(path, skip=MOBSF_SKIP_SECTIONS) if path else ()):
+            has[kind] = True
+            if kind == "static" and isinstance(section, list):
+                # listas de primer nivel con 'severity' o 'Severity'
+                for it in section:
+                    if isinstance(it, dict):
+                        s = str(it.get("severity") or it.get("Severity") or "").upper()
                         if s in sev: sev[s]+=1
-        except Exception:
-            pass
-    if static: out["static"] = {"severity_counts": sev, "has_static": True}
-    if dynamic: out["dynamic"] = {"has_dynamic": True}
+            # mismo recorrido iterativo y acotado que recolectar_datos.py
+            for ikey, it in iter_mobsf_issues(section, key):
+                if len(findings) >= limit:
+                    break
+                f = from_mobsf(it, kind, ikey)
+                if found.add(f):
+                    findings.append(f)
+    if has["static"]: out["static"] = {"severity_counts": sev, "has_static": True}
+    if has["dynamic"]: out["dynamic"] = {"has_dynamic": True}
+    out["findings"] = findings
     return out
 
-def summarize_sast(reports_dir: Path) -> Dict[str, Any]:
-    sarifs = find_files(reports_dir, ["*.sarif"])
-    findings = []
-    for s in sarifs:
-        js = load_json_any(s) or {}
-        for run in (js.get("runs") or []):
-            tool = (((run.get("tool") or {}).get("driver") or {}).get("name") or "sarif-tool")
-            for r in (run.get("results") or []):
-                level = r.get("level") or ((r.get("properties") or {}).get("severity")) or "warning"
-                rule = r.get("ruleId") or ((r.get("rule") or {}).get("id")) or ""
-                msg  = ((r.get("message") or {}).get("text")) or ""
-                findings.append({"tool": tool, "level": str(level), "rule": str(rule), "message": msg})
+def summarize_sast(reports: ReportIndex, limit: int = MAX_SAST_FINDINGS,
+                   found: Optional[FindingSet] = None) -> Dict[str, Any]:
+    found = FindingSet() if found is None else found
+    findings: List[Finding] = []
+    for s in reports.find("sarif"):
+        for ctx, r in iter_items(s, "runs.item.results.item", {"tool": "runs.item.tool.driver.name"}):
+            if len(findings) >= limit:
+                break
+            if isinstance(r, dict):
+                f = from_sarif(r, ctx.get("tool") or "sarif-tool")
+                if found.add(f):
+                    findings.append(f)
     # también JSON SAST genéricos
-    for g in find_files(reports_dir, ["sast*.json","*codeql*results*.json"]):
-        js = load_json_any(g) or {}
-        if isinstance(js, list):
-            for it in js[:1000]:
-                findings.append({"tool":"sast-json","level":str(it.get("severity","")), "rule":str(it.get("ruleId","")), "message":str(it.get("message",""))})
-    return {"findings": findings[:5000]}
-
-def scan_codebase(root: Path, max_bytes: int = 2_000_000) -> Dict[str,int]:
-    totals = {k:0 for k in PATTERNS}
-    size = 0
-    for p in root.rglob("*"):
-        if not p.is_file(): 
+    for g in reports.find("sast_json"):
+        for n, (_, it) in enumerate(iter_items(g, "item")):
+            if n >= 1000 or len(findings) >= limit:
+                break
+            if isinstance(it, dict):
+                f = from_sast_json(it)
+                if found.add(f):
+                    findings.append(f)
+    return {"findings": findings}
+
+# Directorios que no se recorren a ninguna profundidad (salidas de build, VCS)
+SKIP_DIRS = {".git", ".gradle", ".idea", "build", "node_modules", "__pycache__", ".cxx", ".externalNativeBuild",
+             "intermediates"}
+# Artefactos del pipeline: solo en la raíz del escaneo (org/.../reports/ puede ser código real)
+ROOT_SKIP_DIRS = {"generated", ".ai-cache", "reports", "report"}
+MMAP_MIN_BYTES = 1 << 20
+
+# Un patrón precompilado por nombre, aplicado por separado sobre el mismo buffer (bytes: sin decodificar ni
+# copiar en mmap) para que las coincidencias solapadas de patrones distintos cuenten como con re.search
+PATTERN_RX = {k: re.compile(v.encode(), re.IGNORECASE | re.MULTILINE) for k, v in PATTERNS.items()}
+
+def iter_code_files(root: Path):
+    for dirpath, dirnames, filenames in os.walk(root):
+        skip = SKIP_DIRS | ROOT_SKIP_DIRS if dirpath == str(root) else SKIP_DIRS
+        dirnames[:] = [d for d in dirnames if d not in skip]
+        for fn in filenames:
+            if os.path.splitext(fn)[1].lower() in CODE_EXT:
+                yield os.path.join(dirpath, fn)
+
+# Huella de la configuración del escáner: si cambia, el índice incremental se descarta
+SCAN_SIGNATURE = hashlib.sha256(orjson.dumps([PATTERNS, sorted(CODE_EXT), "bytes|I|M|per-pattern"])).hexdigest()
+
+def scan_file(path: str, known_digest: Optional[str] = None) -> tuple:
+    """Devuelve (path, bytes, digest, {patrón: [líneas]}) para un fichero.
+
+    Si el contenido coincide con `known_digest` no se aplica la regex y hits vale None.
+    """
+    hits: Dict[str, List[int]] = {}
+    try:
+        with open(path, "rb") as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if not size:
+                return path, 0, "", hits
+            data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size >= MMAP_MIN_BYTES else fh.read()
+            try:
+                digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+                if digest == known_digest:
+                    return path, size, digest, None
+                for name, rx in PATTERN_RX.items():
+                    line, last = 1, 0
+                    for m in rx.finditer(data):
+                        line += data[last:m.start()].count(b"\n")
+                        last = m.start()
+                        hits.setdefault(name, []).append(line)
+            finally:
+                if isinstance(data, mmap.mmap):
+                    data.close()
+    except (OSError, ValueError):
+        return path, 0, "", hits
+    return path, size, digest, hits
+
+def load_scan_index(path: Optional[Path]) -> Dict[str,Any]:
+    js = load_json_any(path) if path else None
+    if not isinstance(js, dict) or js.get("signature") != SCAN_SIGNATURE:
+        return {}
+    return js.get("files") or {}
+
+def save_scan_index(path: Path, files: Dict[str,Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(orjson.dumps({"signature": SCAN_SIGNATURE, "files": files}))
+    os.replace(tmp, path)
+
+def scan_codebase(root: Path, workers: int = 0, max_locations: int = 200,
+                  index_path: Optional[Path] = None) -> Dict[str,Any]:
+    """Escaneo en una pasada de todo el árbol.
+
+    Devuelve counts (ficheros con coincidencia por patrón, como antes), matches (coincidencias
+    totales), locations ("ruta:línea", acotadas por patrón), files y bytes escaneados.
+    Con `index_path` reutiliza los resultados por fichero de la ejecución anterior: si
+    (tamaño, mtime) coinciden no se lee el fichero; si solo cambia el mtime se compara el hash.
+    """
+    prev = load_scan_index(index_path)
+    index: Dict[str,Any] = {}
+    todo: List[str] = []; known: List[Optional[str]] = []
+    reused = 0
+    for path in sorted(iter_code_files(root)):
+        rel = os.path.relpath(path, root)
+        try:
+            st = os.stat(path)
+        except OSError:
             continue
-        if p.suffix.lower() not in CODE_EXT: 
+        entry = prev.get(rel)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            index[rel] = entry; reused += 1
             continue
-        try:
-            b = p.read_bytes()
-            size += len(b)
-            if size > max_bytes: 
-                break
-            txt = b.decode("utf-8", errors="ignore")
-            for name, rx in PATTERNS.items():
-                if re.search(rx, txt, flags=re.IGNORECASE|re.MULTILINE):
-                    totals[name]+=1
-        except Exception:
+        index[rel] = [st.st_size, st.st_mtime_ns, entry[2] if entry else "", entry[3] if entry else {}]
+        todo.append(path); known.append(entry[2] if entry else None)
+
+    workers = workers or (os.cpu_count() or 1)
+    if workers > 1 and len(todo) > 64:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(scan_file, todo, known, chunksize=max(8, len(todo) // (workers * 4))))
+    else:
+        results = [scan_file(p, k) for p, k in zip(todo, known)]
+    rescanned = 0
+    for path, size, digest, hits in results:
+        entry = index[os.path.relpath(path, root)]
+        entry[2] = digest
+        if hits is None:
+            reused += 1
+        else:
+            entry[3] = hits; rescanned += 1
+
+    out: Dict[str,Any] = {"counts": {k: 0 for k in PATTERNS}, "matches": {k: 0 for k in PATTERNS},
+                          "locations": {k: [] for k in PATTERNS}, "files": len(index), "bytes": 0,
+                          "rescanned": rescanned, "reused": reused}
+    for rel, (size, _mtime, _digest, hits) in index.items():
+        out["bytes"] += size
+        for name, lines in hits.items():
+            if name not in out["counts"]:
+                continue
+            out["counts"][name] += 1
+            out["matches"][name] += len(lines)
+            locs = out["locations"][name]
+            locs.extend(f"{rel}:{n}" for n in lines[: max(0, max_locations - len(locs))])
+    if index_path:
+        save_scan_index(index_path, index)
+    return out
+
+# --- Índice de evidencias (BM25 sobre términos + etiquetas temáticas) ---
+STOPWORDS = set("""a an and are as at be by for from has have in is it its of on or should that the this to
+with must not no all any app application mobile de la el en los las que por para con del""".split())
+
+# etiquetas que acercan el vocabulario de los requisitos al de los escáneres
+TOPIC_TAGS = {
+    "tls": {"ssl","tls","https","certificate","certificates","hostname","trustmanager","trust","pinning",
+            "x509","cleartext","plaintext","transport","http","allow"},
+    "webview": {"webview","javascript","addjavascriptinterface","js","interface"},
+    "crypto": {"crypto","cryptographic","cipher","encryption","encrypt","encrypted","aes","des","md5",
+               "sha1","hash","random","securerandom","ecb","keystore"},
+    "secrets": {"secret","secrets","password","passwords","credential","credentials","hardcoded",
+                "apikey","api","token","tokens","key","keys"},
+    "storage": {"storage","sharedpreferences","sqlite","database","external","cache","backup",
+                "log","logs","logging","clipboard"},
+    "auth": {"authentication","authorization","authenticate","session","login","biometric","oauth",
+             "privilege","access"},
+    "component": {"exported","activity","intent","provider","receiver","service","component",
+                  "manifest","permission","permissions","deeplink"},
+    "dependency": {"dependency","dependencies","library","libraries","package","cve","vulnerable",
+                   "outdated","version","third","party","sdk"},
+    "injection": {"injection","sql","xss","command","traversal","validation","validate","sanitize",
+                  "input","deserialization"},
+}
+PATTERN_TAGS = {"ssl_allow_all": "tls", "webview_js": "webview", "add_js_interface": "webview",
+                "hardcoded_key": "secrets", "exported_activity": "component", "plaintext_http": "tls"}
+
+_WORD_RX = re.compile(r"[A-Za-z][A-Za-z0-9]+")
+_CAMEL_RX = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+def tokenize(text: str) -> List[str]:
+    out: List[str] = []
+    for w in _WORD_RX.findall(text or ""):
+        parts = {w.lower()} | {p.lower() for p in _CAMEL_RX.split(w) if len(p) > 1}
+        out.extend(p for p in parts if p not in STOPWORDS)
+    tags = {f"#{t}" for t, kws in TOPIC_TAGS.items() for tok in out if tok in kws}
+    return out + sorted(tags)
+
+SEV_RANK = {"critical": 4, "error": 3, "high": 3, "medium": 2, "warning": 2, "moderate": 2,
+            "low": 1, "note": 1, "info": 0}
+
+class EvidenceIndex:
+    """Índice invertido (BM25) sobre hallazgos SAST/Trivy/MobSF y patrones de código."""
+    def __init__(self, items: List[Dict[str,Any]], k1: float = 1.2, b: float = 0.75):
+        t0 = time.perf_counter()
+        self.items = items
+        self.k1 = k1; self.b = b
+        self.postings: Dict[str, List[tuple]] = {}
+        self.lengths: List[int] = []
+        for i, it in enumerate(items):
+            toks = tokenize(" ".join(str(v) for v in it.values() if isinstance(v, (str, int))))
+            tags = it.get("tags") or []
+            toks.extend(f"#{t}" for t in tags if t)
+            self.lengths.append(len(toks) or 1)
+            for term, tf in Counter(toks).items():
+                self.postings.setdefault(term, []).append((i, tf))
+        n = len(items) or 1
+        self.avgdl = sum(self.lengths) / n if self.lengths else 1.0
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+        self.build_ms = (time.perf_counter() - t0) * 1000
+        self.queries = 0; self.query_ms = 0.0
+
+    @classmethod
+    def from_evidence(cls, findings: Iterable[Finding], codep: Dict[str,Any],
+                      code_locations: Optional[Dict[str,List[str]]] = None) -> "EvidenceIndex":
+        # hallazgos ya normalizados y deduplicados (FindingSet) + patrones de código
+        items: List[Dict[str,Any]] = [f.as_dict() for f in findings]
+        for name, n in (codep or {}).items():
+            if n:
+                items.append({"source": "code-pattern", "rule": name, "count": n,
+                              "tags": [PATTERN_TAGS.get(name, "")]})
+        for name, locs in (code_locations or {}).items():
+            for loc in locs:
+                items.append({"source": "code-pattern", "rule": name, "location": loc,
+                              "tags": [PATTERN_TAGS.get(name, "")]})
+        return cls(items)
+
+    def query(self, text: str, k: int = 15) -> List[Dict[str,Any]]:
+        t0 = time.perf_counter()
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(text)):
+            idf = self.idf.get(term)
+            if not idf:
+                continue
+            for i, tf in self.postings[term]:
+                norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avgdl)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / norm
+        top = sorted(scores, key=lambda i: (-scores[i], -SEV_RANK.get(str(self.items[i].get("severity","")).lower(), 0), i))[:k]
+        self.queries += 1; self.query_ms += (time.perf_counter() - t0) * 1000
+        return [{k2: v for k2, v in self.items[i].items() if k2 != "tags" and v not in ("", None)} for i in top]
+
+    def stats(self) -> Dict[str,Any]:
+        return {"items": len(self.items), "terms": len(self.postings), "build_ms": round(self.build_ms, 2),
+                "queries": self.queries,
+                "avg_query_ms": round(self.query_ms / self.queries, 3) if self.queries else 0.0}
+
+# --- Agrupación de requisitos casi duplicados (TF-IDF + coseno, líder voraz) ---
+# Normalización propia (no la de BM25): sin stopwords ni etiquetas, para que "must not" no equivalga a "must"
+_CLUSTER_RX = re.compile(r"[a-z0-9]+")
+# Negaciones y verbos modales: requisitos con distinto conjunto nunca se agrupan
+POLARITY_TERMS = {"not", "no", "never", "nor", "without", "cannot", "must", "should", "shall", "may", "might",
+                  "can", "optional", "prohibited", "forbidden"}
+
+def cluster_terms(text: str) -> List[str]:
+    """Palabras y bigramas (shingles) del texto en minúsculas, con "n't" expandido a "not"."""
+    text = text.lower().replace("can't", "cannot").replace("n't", " not")
+    words = _CLUSTER_RX.findall(text)
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+def polarity(text: str) -> frozenset:
+    return frozenset(t for t in cluster_terms(text) if t in POLARITY_TERMS)
+
+def tfidf_vectors(texts: List[str]) -> List[Dict[str,float]]:
+    docs = [Counter(cluster_terms(x)) for x in texts]
+    df: Counter = Counter()
+    for d in docs:
+        df.update(d.keys())
+    n = len(docs) or 1
+    out = []
+    for d in docs:
+        v = {t: tf * (math.log((1 + n) / (1 + df[t])) + 1) for t, tf in d.items()}
+        norm = math.sqrt(sum(w * w for w in v.values())) or 1.0
+        out.append({t: w / norm for t, w in v.items()})
+    return out
+
+def cluster_requirements(reqs: List[Dict[str,Any]], threshold: float,
+                         exclude: Iterable[str] = ()) -> List[Dict[str,Any]]:
+    """Agrupa requisitos cuyo texto tiene similitud coseno >= threshold con el representante.
+
+    Cada requisito se compara solo con los representantes ya elegidos (sin encadenamiento) que
+    tengan sus mismas negaciones y verbos modales (`polarity`); los PUID de `exclude` forman
+    siempre su propio grupo. Devuelve
+    [{"rep": req, "members": [(req, similitud), ...]}] con el representante como primer miembro.
+    """
+    exclude = set(exclude)
+    vecs = tfidf_vectors([r["text"] for r in reqs])
+    clusters: List[Dict[str,Any]] = []
+    postings: Dict[str, List[tuple]] = {}   # término -> [(nº cluster, peso del representante)]
+    pols: List[frozenset] = []
+    for r, v in zip(reqs, vecs):
+        best, best_sim = None, 0.0
+        pol = polarity(r["text"])
+        if r["id"] not in exclude and v:
+            acc: Dict[int,float] = {}
+            for t, w in v.items():
+                for c, wr in postings.get(t, ()):
+                    acc[c] = acc.get(c, 0.0) + w * wr
+            for c, sim in acc.items():
+                if sim >= threshold and sim > best_sim and pols[c] == pol:
+                    best, best_sim = c, sim
+        if best is not None:
+            clusters[best]["members"].append((r, round(best_sim, 4)))
             continue
-    return totals
+        clusters.append({"rep": r, "members": [(r, 1.0)]})
+        pols.append(pol)
+        if r["id"] not in exclude:
+            for t, w in v.items():
+                postings.setdefault(t, []).append((len(clusters) - 1, w))
+    return clusters
+
+# --- Métricas del pipeline (metrics.json) ---
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+def _cpu_seconds() -> float:
+    t = os.times()  # incluye los procesos hijos ya terminados (pool del escáner, DOCX)
+    return t.user + t.system + t.children_user + t.children_system
+
+def peak_rss_mb() -> Dict[str,float]:
+    if resource is None:
+        return {}
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss: bytes en macOS, KiB en Linux
+    return {"self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+            "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)}
+
+class PipelineMetrics:
+    """Tiempos de pared y CPU por etapa, latencia y tokens de cada petición LLM, errores y RSS máximo."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[str,Dict[str,float]] = {}
+        self.latencies: List[float] = []
+        self.tokens: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.retries = 0
+        self._t0 = time.perf_counter(); self._c0 = _cpu_seconds()
+        self._current: Optional[tuple] = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        w, c = time.perf_counter(), _cpu_seconds()
+        try:
+            yield
+        finally:
+            self._add_stage(name, time.perf_counter() - w, _cpu_seconds() - c)
+
+    def lap(self, name: Optional[str]) -> None:
+        """Cierra la etapa en curso y abre `name` (None solo cierra); cómodo en un flujo secuencial."""
+        now, cpu = time.perf_counter(), _cpu_seconds()
+        if self._current:
+            prev, w, c = self._current
+            self._add_stage(prev, now - w, cpu - c)
+        self._current = (name, now, cpu) if name else None
+
+    def _add_stage(self, name: str, wall: float, cpu: float) -> None:
+        with self._lock:
+            st = self.stages.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "runs": 0})
+            st["wall_s"] += wall; st["cpu_s"] += cpu; st["runs"] += 1
+
+    def record_call(self, seconds: float, usage: Any = None) -> None:
+        with self._lock:
+            self.latencies.append(seconds * 1000)
+            self.tokens["requests"] += 1
+            for k in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                self.tokens[k] += int(getattr(usage, k, 0) or 0)
+            cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0)
+            self.tokens["cached_prompt_tokens"] += int(cached or 0)
+
+    def record_error(self, e: Exception, seconds: float, retrying: bool) -> None:
+        with self._lock:
+            self.latencies.append(seconds * 1000)
+            self.errors[str(_status_code(e) or e.__class__.__name__)] += 1
+            if retrying:
+                self.retries += 1
+
+    def latency_summary(self) -> Dict[str,Any]:
+        with self._lock:
+            xs = sorted(self.latencies)
+        if not xs:
+            return {"count": 0}
+        pct = lambda q: round(xs[min(len(xs) - 1, int(q * len(xs)))], 1)
+        hist: Dict[str,int] = {}
+        for x in xs:
+            b = next((f"<={b}" for b in LATENCY_BUCKETS_MS if x <= b), f">{LATENCY_BUCKETS_MS[-1]}")
+            hist[b] = hist.get(b, 0) + 1
+        return {"count": len(xs), "mean": round(sum(xs) / len(xs), 1), "p50": pct(0.5), "p90": pct(0.9),
+                "p99": pct(0.99), "max": round(xs[-1], 1), "histogram_ms": hist}
+
+    def to_dict(self, **extra: Any) -> Dict[str,Any]:
+        self.lap(None)
+        stages = {k: {"wall_s": round(v["wall_s"], 3), "cpu_s": round(v["cpu_s"], 3), "runs": v["runs"]}
+                  for k, v in self.stages.items()}
+        return {"wall_s": round(time.perf_counter() - self._t0, 3), "cpu_s": round(_cpu_seconds() - self._c0, 3),
+                "stages": stages,
+                "llm": {"tokens": dict(self.tokens), "errors": dict(self.errors), "retries": self.retries,
+                        "latency_ms": self.latency_summary()},
+                "peak_rss_mb": peak_rss_mb(), **extra}
 
 def build_openai() -> Optional["OpenAI"]:
     if not USE_OPENAI:
@@ -159,55 +524,643 @@ def build_openai() -> Optional["OpenAI"]:
     if not api_key:
         return None
     try:
-        # Se puede configurar timeout si lo deseas
-        return OpenAI()
+        # los reintentos los gestiona call_llm (backoff con jitter + rate limiter)
+        return OpenAI(max_retries=0)
     except Exception:
         return None
 
-def ask_llm(client: Optional["OpenAI"], model: str, req: Dict[str,Any], evidence: Dict[str,Any]) -> Dict[str,Any]:
-    base = {"puid": req["id"], "status":"Insufficient_Evidence", "severity":"unknown",
-            "rationale":"No AI available or insufficient inputs.", "references":[], "tags":[]}
-    if not client:
-        return base
-    user = {
-        "role": "user",
-        "content": f"""
+# Reintentos: 429 y 5xx (más timeouts: 408 y errores de conexión); el resto de 4xx no es transitorio
+RETRY_STATUS = {408, 429}
+
+class RateLimiter:
+    """Ventana deslizante de 60 s para requests/min y tokens/min (thread-safe). 0 = sin límite."""
+    def __init__(self, rpm: int = 0, tpm: int = 0):
+        self.rpm = max(0, int(rpm or 0))
+        self.tpm = max(0, int(tpm or 0))
+        self._lock = threading.Lock()
+        self._events: deque = deque()   # (t, tokens)
+        self._tokens = 0
+
+    def acquire(self, tokens: int = 0) -> None:
+        if not self.rpm and not self.tpm:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._events and now - self._events[0][0] >= 60.0:
+                    _, t = self._events.popleft()
+                    self._tokens -= t
+                ok_rpm = not self.rpm or len(self._events) < self.rpm
+                # una petición mayor que el límite TPM pasa sola cuando la ventana está vacía
+                ok_tpm = not self.tpm or not self._events or self._tokens + tokens <= self.tpm
+                if ok_rpm and ok_tpm:
+                    self._events.append((now, tokens))
+                    self._tokens += tokens
+                    return
+                wait = 60.0 - (now - self._events[0][0])
+            time.sleep(min(max(wait, 0.01), 1.0))
+
+def estimate_tokens(text: str) -> int:
+    # aproximación ~4 caracteres por token
+    return len(text) // 4 + 1
+
+def _status_code(e: Exception) -> Optional[int]:
+    code = getattr(e, "status_code", None)
+    if code is None:
+        code = getattr(getattr(e, "response", None), "status_code", None)
+    try:
+        return int(code) if code is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _is_retryable(e: Exception) -> bool:
+    code = _status_code(e)
+    if code is not None:
+        return code in RETRY_STATUS or code >= 500
+    return e.__class__.__name__ in ("APIConnectionError", "APITimeoutError", "Timeout", "ConnectionError")
+
+def _retry_after(e: Exception) -> Optional[float]:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        v = headers.get("retry-after")
+        return float(v) if v is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    # "full jitter": uniforme en [0, min(cap, base*2^n)]
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def call_llm(client: "OpenAI", model: str, messages: List[Dict[str,str]],
+             limiter: Optional[RateLimiter] = None, retries: int = 4, max_completion: int = 400,
+             metrics: Optional[PipelineMetrics] = None):
+    est = sum(estimate_tokens(m["content"]) for m in messages) + max_completion
+    attempt = 0
+    while True:
+        if limiter:
+            limiter.acquire(est)
+        t0 = time.perf_counter()
+        try:
+            resp = client.chat.completions.create(model=model, messages=messages, temperature=0.2)
+            if metrics:
+                metrics.record_call(time.perf_counter() - t0, getattr(resp, "usage", None))
+            return resp
+        except Exception as e:
+            retrying = attempt < retries and _is_retryable(e)
+            if metrics:
+                metrics.record_error(e, time.perf_counter() - t0, retrying)
+            if not retrying:
+                raise
+            ra = _retry_after(e)
+            time.sleep(ra if ra is not None else backoff_delay(attempt))
+            attempt += 1
+
+# Presupuesto de hallazgos por requisito en el prompt (caracteres JSON): se recorta por elementos completos
+FINDINGS_CHARS = 5000
+
+def trim_findings(findings: Optional[List[Any]], budget: int = FINDINGS_CHARS) -> List[Any]:
+    """Prefijo de `findings` (ya ordenados por relevancia) cuyo JSON cabe en `budget` caracteres."""
+    out: List[Any] = []
+    used = 2
+    for f in findings or []:
+        n = len(json.dumps(f, ensure_ascii=False)) + 2
+        if used + n > budget:
+            break
+        out.append(f); used += n
+    return out
+
+def render_context(evidence: Dict[str,Any]) -> str:
+    lines = [f"- Trivy summary: {json.dumps(evidence.get('trivy',{}))[:3500]}",
+             f"- MobSF summary: {json.dumps(evidence.get('mobsf',{}))[:3500]}"]
+    if "findings" in evidence:
+        lines.append(f"- Relevant findings: {json.dumps(trim_findings(evidence['findings']), ensure_ascii=False)}")
+    lines.append(f"- Code patterns: {json.dumps(evidence.get('code',{}))}")
+    return "CONTEXTO:\n" + "\n".join(lines)
+
+def build_user_prompt(req: Dict[str,Any], evidence: Dict[str,Any]) -> str:
+    return f"""
 REQUISITO:
 ID: {req['id']}
 Texto: {req['text']}
 
-CONTEXTO:
-- Trivy summary: {json.dumps(evidence.get('trivy',{}))[:3500]}
-- MobSF summary: {json.dumps(evidence.get('mobsf',{}))[:3500]}
-- SAST sample: {json.dumps((evidence.get('sast') or [])[:20])[:3500]}
-- Code patterns: {json.dumps(evidence.get('code',{}))}
+{render_context(evidence)}
 
 INSTRUCCIONES:
 1) Decide status (Yes/No/N_a/Insufficient_Evidence).
 2) 1-2 frases de rationale.
 3) Asigna severidad aproximada (critical/high/medium/low/unknown).
-4) Lista 1..3 referencias (texto libre: indicios o archivo).
+4) Lista 1..3 referencias (texto libre: indicios o archivo:línea cuando exista).
 5) tags (p.ej., ['ssl','webview','hardcoded'])
 6) Solo JSON, sin comentarios.
 """.strip()
-    }
+
+def parse_llm_json(txt: str) -> Any:
+    txt = (txt or "").strip().strip("` ")
+    if txt.lower().startswith("json"):
+        txt = txt[4:].lstrip()
+    return json.loads(txt)
+
+def ask_llm(client: Optional["OpenAI"], model: str, req: Dict[str,Any], evidence: Dict[str,Any],
+            limiter: Optional[RateLimiter] = None, retries: int = 4,
+            metrics: Optional[PipelineMetrics] = None) -> Dict[str,Any]:
+    base = {"puid": req["id"], "status":"Insufficient_Evidence", "severity":"unknown",
+            "rationale":"No AI available or insufficient inputs.", "references":[], "tags":[]}
+    if not client:
+        return base
+    user = {"role": "user", "content": build_user_prompt(req, evidence)}
     try:
-        resp = client.chat.completions.create(
-            model=model,
-            messages=[{"role":"system","content":SYSTEM_PROMPT}, user],
-            temperature=0.2,
-        )
-        txt = (resp.choices[0].message.content or "").strip().strip("` ")
-        if txt.lower().startswith("json"):
-            txt = txt[4:].lstrip()
-        js = json.loads(txt)
+        resp = call_llm(client, model, [{"role":"system","content":SYSTEM_PROMPT}, user],
+                        limiter=limiter, retries=retries, metrics=metrics)
+        js = parse_llm_json(resp.choices[0].message.content)
         js["puid"] = js.get("puid") or req["id"]
         return js
     except Exception as e:
         base["rationale"] = f"AI error: {e.__class__.__name__}"
         return base
 
-def write_docx_seccat(path: Path, app_name: str, findings: List[Dict[str,Any]]):
+# --- Modo por lotes: N requisitos por petición, evidencia compartida enviada una sola vez ---
+VALID_STATUS = {"yes": "Yes", "no": "No", "n_a": "N_a", "na": "N_a", "insufficient_evidence": "Insufficient_Evidence"}
+
+def make_batches(reqs: List[Dict[str,Any]], max_items: int, token_budget: int,
+                 cost: Optional[Callable[[Dict[str,Any]], int]] = None) -> List[List[Dict[str,Any]]]:
+    """Agrupa requisitos consecutivos hasta `max_items` o hasta agotar el presupuesto de tokens.
+
+    `cost(req)` estima los tokens propios de cada requisito (por defecto solo su texto).
+    """
+    batches: List[List[Dict[str,Any]]] = []
+    cur: List[Dict[str,Any]] = []; cur_tok = 0
+    for r in reqs:
+        t = cost(r) if cost else estimate_tokens(r["text"]) + 16
+        if cur and (len(cur) >= max_items or cur_tok + t > token_budget):
+            batches.append(cur); cur = []; cur_tok = 0
+        cur.append(r); cur_tok += t
+    if cur:
+        batches.append(cur)
+    return batches
+
+def _item_key(x: Any) -> bytes:
+    return orjson.dumps(x, option=orjson.OPT_SORT_KEYS, default=str)
+
+def merge_evidence(evs: List[Dict[str,Any]]) -> Dict[str,Any]:
+    """Evidencia común de un grupo: listas intercaladas sin duplicados, resto del primer elemento no vacío.
+
+    Las listas se recorren por rangos (el 1º de cada una, luego el 2º...) para que el recorte por
+    presupuesto conserve los hallazgos más relevantes de todos los miembros.
+    """
+    if not evs:
+        return {}
+    first = evs[0]
+    if all(e is first or e == first for e in evs[1:]):
+        return first
+    out: Dict[str,Any] = {}
+    lists: Dict[str,List[List[Any]]] = {}
+    for e in evs:
+        for k, v in e.items():
+            if isinstance(v, list):
+                lists.setdefault(k, []).append(v)
+            elif not out.get(k):
+                out[k] = v
+    for k, vs in lists.items():
+        cur = out[k] = []
+        seen = set()
+        for rank in range(max(len(v) for v in vs)):
+            for v in vs:
+                if rank < len(v):
+                    h = _item_key(v[rank])
+                    if h not in seen:
+                        seen.add(h); cur.append(v[rank])
+    return out
+
+def build_batch_prompt(reqs: List[Dict[str,Any]], evidences: List[Dict[str,Any]]) -> str:
+    """Prompt de lote: contexto común una vez y, por requisito, los índices de SUS hallazgos.
+
+    Cada requisito conserva su propia evidencia (recortada por elementos a FINDINGS_CHARS); los
+    hallazgos compartidos se listan una sola vez y se referencian por índice.
+    """
+    pool: List[Any] = []
+    pos: Dict[bytes,int] = {}
+    items = []
+    for r, ev in zip(reqs, evidences):
+        refs = []
+        for f in trim_findings(ev.get("findings")):
+            h = _item_key(f)
+            if h not in pos:
+                pos[h] = len(pool); pool.append(f)
+            refs.append(pos[h])
+        items.append(f"ID: {r['id']}\nTexto: {r['text']}\nHallazgos relevantes: {refs}")
+    body = "\n\n".join(items)
+    shared = {k: v for k, v in (evidences[0] if evidences else {}).items() if k != "findings"}
+    found = "\n".join(f"[{i}] {json.dumps(f, ensure_ascii=False)}" for i, f in enumerate(pool)) or "(ninguno)"
+    return f"""
+REQUISITOS ({len(reqs)}):
+{body}
+
+{render_context(shared)}
+
+HALLAZGOS (referenciados por índice en cada requisito):
+{found}
+
+INSTRUCCIONES:
+1) Para CADA requisito decide status (Yes/No/N_a/Insufficient_Evidence) usando solo sus hallazgos relevantes y el contexto.
+2) 1-2 frases de rationale por requisito.
+3) Asigna severidad aproximada (critical/high/medium/low/unknown).
+4) Lista 1..3 referencias (texto libre: indicios o archivo:línea cuando exista).
+5) tags (p.ej., ['ssl','webview','hardcoded'])
+6) Responde SOLO con un array JSON: un objeto por requisito, con su "puid" exacto, en el mismo orden.
+""".strip()
+
+def ask_llm_batch(client: "OpenAI", model: str, reqs: List[Dict[str,Any]], evidences: List[Dict[str,Any]],
+                  limiter: Optional[RateLimiter] = None, retries: int = 4,
+                  metrics: Optional[PipelineMetrics] = None) -> Dict[str,Dict[str,Any]]:
+    """Devuelve {puid: veredicto} solo con entradas válidas; las que falten se evalúan una a una.
+
+    Se descartan (y se reevalúan por la vía individual) las entradas con PUID ajeno al lote, con
+    status no reconocido, que no son objetos o cuyo PUID aparece repetido (respuesta ambigua).
+    """
+    user = {"role": "user", "content": build_batch_prompt(reqs, evidences)}
+    try:
+        resp = call_llm(client, model, [{"role":"system","content":SYSTEM_PROMPT}, user],
+                        limiter=limiter, retries=retries, max_completion=150 * len(reqs), metrics=metrics)
+        js = parse_llm_json(resp.choices[0].message.content)
+    except Exception:
+        return {}
+    if isinstance(js, dict):
+        js = js.get("verdicts") or js.get("results") or [js]
+    wanted = {r["id"] for r in reqs}
+    out: Dict[str,Dict[str,Any]] = {}
+    repeated = set()
+    for v in (js if isinstance(js, list) else []):
+        if not isinstance(v, dict):
+            continue
+        puid = str(v.get("puid") or "").strip()
+        if puid in out or puid in repeated:
+            repeated.add(puid)
+            continue
+        status = VALID_STATUS.get(str(v.get("status") or "").strip().lower().replace("/", "_"))
+        if puid not in wanted or not status:
+            continue
+        v["puid"] = puid; v["status"] = status
+        out[puid] = v
+    for puid in repeated:
+        out.pop(puid, None)
+    return out
+
+def evidence_fingerprint(model: str, req: Dict[str,Any], evidence: Dict[str,Any]) -> str:
+    """Huella de todo lo que determina un veredicto: modelo, prompt, requisito y su evidencia."""
+    blob = orjson.dumps([model, SYSTEM_PROMPT, req["id"], req["text"], evidence],
+                        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    return hashlib.sha256(blob).hexdigest()
+
+class VerdictCache:
+    """Caché persistente (SQLite) de veredictos, direccionada por contenido.
+
+    Clave = sha256(model, SYSTEM_PROMPT, id+texto del requisito, evidencia serializada).
+    Expulsión por TTL y por número máximo de entradas (LRU por último acceso).
+    """
+    def __init__(self, cache_dir: Path, ttl_days: float = 30.0, max_entries: int = 50_000):
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path = cache_dir / "verdicts.sqlite"
+        self.ttl = max(0.0, float(ttl_days or 0)) * 86400
+        self.max_entries = max(0, int(max_entries or 0))
+        self.hits = self.misses = self.stores = self.evicted = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS verdicts ("
+                         "key TEXT PRIMARY KEY, verdict BLOB NOT NULL, "
+                         "created REAL NOT NULL, accessed REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS verdicts_accessed ON verdicts(accessed)")
+        self._db.commit()
+
+    @staticmethod
+    def key(model: str, req: Dict[str,Any], evidence: Dict[str,Any]) -> str:
+        return evidence_fingerprint(model, req, evidence)
+
+    def get(self, key: str) -> Optional[Dict[str,Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT verdict, created FROM verdicts WHERE key=?", (key,)).fetchone()
+            if row and self.ttl and now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM verdicts WHERE key=?", (key,))
+                self._db.commit()
+                self.evicted += 1
+                row = None
+            if not row:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE verdicts SET accessed=? WHERE key=?", (now, key))
+            self._db.commit()
+            self.hits += 1
+        return orjson.loads(row[0])
+
+    def put(self, key: str, verdict: Dict[str,Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO verdicts(key, verdict, created, accessed) VALUES (?,?,?,?)",
+                             (key, orjson.dumps(verdict, default=str), now, now))
+            self._db.commit()
+            self.stores += 1
+
+    def evict(self) -> int:
+        n = 0
+        with self._lock:
+            if self.ttl:
+                n += self._db.execute("DELETE FROM verdicts WHERE created < ?", (time.time() - self.ttl,)).rowcount
+            if self.max_entries:
+                n += self._db.execute(
+                    "DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts ORDER BY accessed DESC "
+                    "LIMIT -1 OFFSET ?)", (self.max_entries,)).rowcount
+            self._db.commit()
+            self.evicted += n
+        return n
+
+    def stats(self) -> Dict[str,Any]:
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "stores": self.stores, "evicted": self.evicted,
+                "entries": size, "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+def is_fallback_verdict(v: Dict[str,Any]) -> bool:
+    # veredictos por defecto (sin IA o con error) no se cachean
+    r = str(v.get("rationale") or "")
+    return r.startswith("AI error") or r == "No AI available or insufficient inputs."
+
+def evaluate_requirements(client: Optional["OpenAI"], model: str, reqs: List[Dict[str,Any]],
+                          evidence_for: Callable[[Dict[str,Any]], Dict[str,Any]],
+                          concurrency: int = 8, limiter: Optional[RateLimiter] = None,
+                          retries: int = 4, cache: Optional[VerdictCache] = None,
+                          batch_size: int = 1, batch_tokens: int = 6000,
+                          counters: Optional[Dict[str,int]] = None,
+                          metrics: Optional[PipelineMetrics] = None,
+                          on_result: Optional[Callable[[Dict[str,Any], Dict[str,Any], str], None]] = None,
+                          collect: bool = True,
+                          desc: str = "Auditing requirements") -> List[Dict[str,Any]]:
+    """Evalúa los requisitos con un pool acotado de hilos; devuelve los veredictos en el orden de `reqs`.
+
+    Con `batch_size` > 1 se agrupan los requisitos no cacheados en lotes y solo los veredictos
+    ausentes o malformados de cada lote se reintentan por la vía individual.
+    `on_result(req, verdict, fingerprint)` se invoca en cuanto cada veredicto está listo (p.ej. checkpoint);
+    con `collect=False` no se retienen los veredictos y se devuelve una lista vacía.
+    """
+    counters = counters if counters is not None else {}
+    for k in ("llm_calls", "batch_calls", "batch_fallbacks", "cache_hits"):
+        counters.setdefault(k, 0)
+    lock = threading.Lock()
+    def bump(k: str, n: int = 1):
+        with lock:
+            counters[k] += n
+
+    evs = [evidence_for(r) for r in reqs]
+    fps = [evidence_fingerprint(model, r, e) for r, e in zip(reqs, evs)]
+    keys = fps if cache else [None] * len(reqs)
+    results: List[Optional[Dict[str,Any]]] = [None] * len(reqs) if collect else []
+    done = [False] * len(reqs)
+    workers = max(1, int(concurrency or 1))
+    bar = tqdm(total=len(reqs), desc=desc)
+
+    def finish(i: int, verdict: Dict[str,Any], store: bool = True):
+        if store and keys[i] and client and not is_fallback_verdict(verdict):
+            cache.put(keys[i], verdict)
+        if on_result:
+            on_result(reqs[i], verdict, fps[i])
+        if collect:
+            results[i] = verdict
+        done[i] = True
+        bar.update(1)
+
+    pending: List[int] = []
+    for i, k in enumerate(keys):
+        hit = cache.get(k) if k else None
+        if hit is not None:
+            hit["puid"] = reqs[i]["id"]
+            bump("cache_hits")
+            finish(i, hit, store=False)
+        else:
+            pending.append(i)
+
+    def run(fn, items):
+        if workers == 1 or len(items) <= 1:
+            for it in items:
+                fn(it)
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm") as pool:
+                list(pool.map(fn, items))
+
+    if client and batch_size > 1 and len(pending) > 1:
+        by_id = {reqs[i]["id"]: i for i in pending}
+        def cost(r: Dict[str,Any]) -> int:
+            # texto + hallazgos propios (cota superior: los compartidos se envían una sola vez)
+            found = trim_findings(evs[by_id[r["id"]]].get("findings"))
+            return estimate_tokens(r["text"]) + estimate_tokens(json.dumps(found, ensure_ascii=False)) + 16
+        groups = make_batches([reqs[i] for i in pending], batch_size, batch_tokens, cost)
+        def one_batch(group: List[Dict[str,Any]]):
+            idx = [by_id[r["id"]] for r in group]
+            got = ask_llm_batch(client, model, group, [evs[i] for i in idx],
+                                limiter=limiter, retries=retries, metrics=metrics)
+            bump("llm_calls"); bump("batch_calls")
+            for i in idx:
+                if reqs[i]["id"] in got:
+                    finish(i, got[reqs[i]["id"]])
+        run(one_batch, groups)
+        pending = [i for i in pending if not done[i]]
+        bump("batch_fallbacks", len(pending))
+
+    def one(i: int):
+        verdict = ask_llm(client, model, reqs[i], evs[i], limiter=limiter, retries=retries, metrics=metrics)
+        if client:
+            bump("llm_calls")
+        finish(i, verdict)
+    run(one, pending)
+    bar.close()
+    return results
+
+def make_finding(req: Dict[str,Any], verdict: Dict[str,Any], fingerprint: str = "") -> Dict[str,Any]:
+    out = {
+        "puid": req["id"],
+        "id": req["id"],
+        "text": req["text"],
+        "status": (verdict.get("status") or "Insufficient_Evidence"),
+        "severity": (verdict.get("severity") or "unknown"),
+        "rationale": verdict.get("rationale",""),
+        "references": verdict.get("references",[]),
+        "tags": verdict.get("tags",[]),
+    }
+    if fingerprint:
+        out["fingerprint"] = fingerprint
+    if verdict.get("cluster"):
+        out["cluster"] = verdict["cluster"]
+    return out
+
+def load_previous_findings(path: Path) -> Dict[str,Dict[str,Any]]:
+    """puid -> hallazgo de un audit-findings.json anterior (leído en streaming)."""
+    return {str(f.get("puid")): f for _, f in iter_items(path, "findings.item")
+            if isinstance(f, dict) and f.get("puid")}
+
+def plan_delta(reqs: List[Dict[str,Any]], fingerprints: Dict[str,str],
+               previous: Dict[str,Dict[str,Any]]) -> tuple:
+    """Separa requisitos reutilizables (misma huella y veredicto real) de los que hay que reevaluar."""
+    reuse: List[Dict[str,Any]] = []; todo: List[Dict[str,Any]] = []
+    reasons: Dict[str,str] = {}
+    for r in reqs:
+        prev = previous.get(r["id"])
+        if not prev:
+            reasons[r["id"]] = "new"
+        elif not prev.get("fingerprint"):
+            reasons[r["id"]] = "no_fingerprint"
+        elif prev["fingerprint"] != fingerprints[r["id"]]:
+            reasons[r["id"]] = "changed"
+        elif is_fallback_verdict(prev):
+            reasons[r["id"]] = "previous_fallback"
+        else:
+            reuse.append(r)
+            continue
+        todo.append(r)
+    return reuse, todo, reasons
+
+class Checkpoint:
+    """Hallazgos en JSONL, un registro por requisito en cuanto termina (append + flush).
+
+    Permite reanudar (`done()`, sin los veredictos de respaldo) y construir las salidas finales recorriendo el fichero
+    en el orden de los requisitos sin cargarlo entero (`iter_findings`).
+    """
+    def __init__(self, path: Path, resume: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+        if not resume and path.exists():
+            path.unlink()
+        self._repair_tail()
+        self._fh = open(path, "ab")
+
+    def _repair_tail(self) -> None:
+        # una ejecución interrumpida puede dejar la última línea a medias
+        if not self.path.exists() or not self.path.stat().st_size:
+            return
+        with open(self.path, "rb+") as fh:
+            fh.seek(-1, os.SEEK_END)
+            if fh.read(1) == b"\n":
+                return
+            fh.seek(0)
+            keep = fh.read().rfind(b"\n") + 1
+            fh.truncate(keep)
+
+    def append(self, finding: Dict[str,Any]) -> None:
+        line = orjson.dumps(finding, default=str) + b"\n"
+        with self._lock:
+            self._fh.write(line)
+            self._fh.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+
+    def offsets(self) -> Dict[str,int]:
+        """puid -> desplazamiento de su último registro válido."""
+        out: Dict[str,int] = {}
+        with open(self.path, "rb") as fh:
+            pos = 0
+            for line in fh:
+                try:
+                    out[orjson.loads(line)["puid"]] = pos
+                except Exception:
+                    pass
+                pos += len(line)
+        return out
+
+    def done(self) -> set:
+        """PUID cuyo último registro es un veredicto real; los de respaldo (sin IA o con error) se reevalúan."""
+        out: set = set()
+        if not self.path.exists():
+            return out
+        with open(self.path, "rb") as fh:
+            for line in fh:
+                try:
+                    rec = orjson.loads(line)
+                except Exception:
+                    continue
+                if is_fallback_verdict(rec):
+                    out.discard(rec["puid"])
+                else:
+                    out.add(rec["puid"])
+        return out
+
+    def iter_findings(self, puids: List[str]):
+        offs = self.offsets()
+        with open(self.path, "rb") as fh:
+            for puid in puids:
+                if puid in offs:
+                    fh.seek(offs[puid])
+                    yield orjson.loads(fh.readline())
+
+def write_findings_json(path: Path, app_name: str, findings, stats: Dict[str,Any]) -> None:
+    # JSON escrito en streaming: mismo formato que antes sin materializar la lista
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("{\n  \"app\": " + json.dumps(app_name, ensure_ascii=False) + ",\n  \"findings\": [")
+        n = 0
+        for f in findings:
+            body = json.dumps(f, ensure_ascii=False, indent=2).replace("\n", "\n    ")
+            fh.write(("," if n else "") + "\n    " + body)
+            n += 1
+        fh.write(("\n  ]" if n else "]") + ",\n  \"stats\": " + json.dumps(stats, ensure_ascii=False, indent=2).replace("\n", "\n  ") + "\n}")
+
+def finding_stats(findings) -> Dict[str,int]:
+    stats = {"total": 0, "yes":0,"no":0,"na":0,"ins":0}
+    for f in findings:
+        stats["total"] += 1
+        s = (f["status"] or "").lower()
+        if s=="yes": stats["yes"]+=1
+        elif s=="no": stats["no"]+=1
+        elif s in ("n_a","n/a","na"): stats["na"]+=1
+        else: stats["ins"]+=1
+    return stats
+
+# Las tablas se generan en bloque: cada trozo de filas se serializa como XML
+# WordprocessingML y se parsea de una vez con lxml, en lugar de crear las
+# celdas una a una con table.add_row().cells (coste creciente con la tabla).
+DOCX_CHUNK_ROWS = 500
+XML_INVALID = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+def _docx_text(value: Any) -> str:
+    text = XML_INVALID.sub("", str(value or ""))
+    if not text:
+        return ""
+    parts = []
+    for i, line in enumerate(text.split("\n")):
+        if i: parts.append("<w:br/>")
+        for j, chunk in enumerate(line.split("\t")):
+            if j: parts.append("<w:tab/>")
+            if chunk: parts.append(f'<w:t xml:space="preserve">{xml_escape(chunk)}</w:t>')
+    return "<w:r>" + "".join(parts) + "</w:r>"
+
+def append_table_rows(table, rows: Iterable[List[Any]], chunk_rows: int = DOCX_CHUNK_ROWS) -> int:
+    """Añade filas de texto al final de `table`; equivale a add_row() + cell.text por celda."""
+    tbl = table._tbl
+    cells = []
+    for col in tbl.tblGrid.gridCol_lst:
+        tcpr = f'<w:tcPr><w:tcW w:type="dxa" w:w="{col.w.twips}"/></w:tcPr>' if col.w is not None else ""
+        cells.append("<w:tc>" + tcpr + "<w:p>{}</w:p></w:tc>")
+    head, n, buf = f"<w:tbl {nsdecls('w')}>", 0, []
+    def flush():
+        if buf:
+            tbl.extend(list(parse_xml(head + "".join(buf) + "</w:tbl>")))
+            buf.clear()
+    for row in rows:
+        buf.append("<w:tr>" + "".join(c.format(_docx_text(v)) for c, v in zip(cells, row)) + "</w:tr>")
+        n += 1
+        if len(buf) >= chunk_rows:
+            flush()
+    flush()
+    return n
+
+def docx_row(f: Dict[str,Any]) -> Dict[str,str]:
+    # Vista mínima de un hallazgo con lo que usan las tablas (barata de enviar a otro proceso)
+    return {k: f.get(k,"") or "" for k in ("puid","text","status","severity")}
+
+def write_docx_seccat(path: Path, app_name: str, findings: Iterable[Dict[str,Any]]):
     doc = Document()
     doc.add_heading("SRS for Security on mHealth applications (SEC-CAT*) – Adapted", level=0)
     p = doc.add_paragraph(f"Audited application: {app_name}")
@@ -218,31 +1171,24 @@ def write_docx_seccat(path: Path, app_name: str, findings: List[Dict[str,Any]]):
     hdr[1].text = "Requirement"
     hdr[2].text = "Status"
     hdr[3].text = "Severity"
-    for f in findings:
-        r = table.add_row().cells
-        r[0].text = f.get("puid","")
-        r[1].text = f.get("text","")
-        r[2].text = f.get("status","")
-        r[3].text = f.get("severity","")
+    append_table_rows(table, ((f.get("puid",""), f.get("text",""), f.get("status",""), f.get("severity",""))
+                              for f in findings))
     doc.save(path)
 
-def write_docx_checklist(path: Path, findings: List[Dict[str,Any]]):
+def write_docx_checklist(path: Path, findings: Iterable[Dict[str,Any]]):
     doc = Document()
     doc.add_heading("Compliance Checklist – SEC-CAT*", level=0)
     t = doc.add_table(rows=1, cols=5)
     h = t.rows[0].cells
     h[0].text="PUID"; h[1].text="Requirement"; h[2].text="Yes"; h[3].text="No"; h[4].text="N/a"
-    for f in findings:
-        s = (f.get("status","") or "").lower()
-        yes = "X" if s == "yes" else ""
-        no  = "X" if s == "no" else ""
-        na  = "X" if s in ("n_a","n/a","na") else ""
-        row = t.add_row().cells
-        row[0].text = f.get("puid","")
-        row[1].text = f.get("text","")
-        row[2].text = yes
-        row[3].text = no
-        row[4].text = na
+    def rows():
+        for f in findings:
+            s = (f.get("status","") or "").lower()
+            yes = "X" if s == "yes" else ""
+            no  = "X" if s == "no" else ""
+            na  = "X" if s in ("n_a","n/a","na") else ""
+            yield (f.get("puid",""), f.get("text",""), yes, no, na)
+    append_table_rows(t, rows())
     doc.save(path)
 
 def write_docx_summary(path: Path, app_name: str, stats: Dict[str,Any], notes: List[str]):
@@ -256,93 +1202,440 @@ def write_docx_summary(path: Path, app_name: str, stats: Dict[str,Any], notes: L
         doc.add_paragraph(f"• {n}")
     doc.save(path)
 
-def main():
+def write_docx_reports(outdir: Path, app_name: str, rows: List[Dict[str,str]], stats: Dict[str,Any],
+                       notes: List[str], workers: int = 0) -> None:
+    """Genera los tres DOCX; con workers > 1 cada documento se construye en su propio proceso."""
+    jobs = [
+        (write_docx_seccat, (outdir/"secm-cat_adapted.docx", app_name, rows)),
+        (write_docx_checklist, (outdir/"checklist.docx", rows)),
+        (write_docx_summary, (outdir/"audit-summary.docx", app_name, stats, notes)),
+    ]
+    workers = min(len(jobs), workers or (os.cpu_count() or 1))
+    if workers <= 1:
+        for fn, a in jobs:
+            fn(*a)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for fut in [pool.submit(fn, *a) for fn, a in jobs]:
+            fut.result()
+
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser()
     ap.add_argument("--checklist", required=True)
-    ap.add_argument("--reports", required=True)
+    ap.add_argument("--reports", help="Directorio de informes o .zip (obligatorio salvo con --manifest)")
     ap.add_argument("--source-root", default=".")
     ap.add_argument("--output-dir", required=True)
     ap.add_argument("--openai-model", default=os.environ.get("OPENAI_MODEL","gpt-4o-mini"))
     ap.add_argument("--max-requirements", type=int, default=-1)
-    args = ap.parse_args()
+    ap.add_argument("--concurrency", type=int, default=int(os.environ.get("AI_CONCURRENCY", "8")),
+                    help="Peticiones LLM simultáneas (1 = secuencial)")
+    ap.add_argument("--rpm", type=int, default=int(os.environ.get("AI_RPM", "450")),
+                    help="Límite de requests por minuto (0 = sin límite)")
+    ap.add_argument("--tpm", type=int, default=int(os.environ.get("AI_TPM", "180000")),
+                    help="Límite estimado de tokens por minuto (0 = sin límite)")
+    ap.add_argument("--max-retries", type=int, default=4,
+                    help="Reintentos con backoff+jitter ante 429/5xx")
+    ap.add_argument("--scan-workers", type=int, default=0,
+                    help="Procesos del escáner de código (0 = nº de CPUs)")
+    ap.add_argument("--no-scan-index", action="store_true",
+                    help="Reescanea todo el árbol sin usar el índice incremental (en --cache-dir)")
+    ap.add_argument("--evidence-top-k", type=int, default=15,
+                    help="Hallazgos más relevantes por requisito (0 = muestra global heredada)")
+    ap.add_argument("--batch-size", type=int, default=int(os.environ.get("AI_BATCH_SIZE", "1")),
+                    help="Requisitos por petición LLM (1 = sin lotes)")
+    ap.add_argument("--batch-tokens", type=int, default=6000,
+                    help="Presupuesto aproximado de tokens por lote (texto de los requisitos y sus hallazgos)")
+    ap.add_argument("--cache-dir", default=os.environ.get("AI_CACHE_DIR", ".ai-cache"),
+                    help="Directorio de la caché de veredictos")
+    ap.add_argument("--no-cache", action="store_true", help="Desactiva la caché de veredictos")
+    ap.add_argument("--cache-ttl-days", type=float, default=30.0, help="Caducidad de entradas (0 = sin TTL)")
+    ap.add_argument("--cache-max-entries", type=int, default=50_000, help="Máximo de entradas (0 = sin límite)")
+    ap.add_argument("--previous", default=None,
+                    help="audit-findings.json anterior (con --manifest, el --output-dir de un lote anterior): "
+                         "solo se reevalúan requisitos cuya evidencia o texto cambió")
+    ap.add_argument("--cluster-threshold", type=float, default=0.0,
+                    help="Similitud coseno para agrupar requisitos casi duplicados (0 = desactivado; p.ej. 0.9)")
+    ap.add_argument("--cluster-exclude", nargs="*", default=[],
+                    help="PUID que se evalúan siempre de forma individual")
+    ap.add_argument("--history", default=os.environ.get("AI_HISTORY"),
+                    help="Histórico SQLite de veredictos y hallazgos entre ejecuciones (por defecto <cache-dir>/history.sqlite)")
+    ap.add_argument("--no-history", action="store_true", help="No añade esta ejecución al histórico")
+    ap.add_argument("--docx-workers", type=int, default=0,
+                    help="Procesos para generar los DOCX en paralelo (0 = nº de CPUs, máx. 3; 1 = secuencial)")
+    ap.add_argument("--resume", action="store_true",
+                    help="Reanuda desde audit-findings.jsonl y omite los PUID ya evaluados")
+    ap.add_argument("--profile", nargs="?", const="-", default=None, metavar="PATH",
+                    help="Perfil cProfile del hilo principal (.prof + resumen .txt); sin PATH, <output-dir>/profile.prof "
+                         "(con --manifest, un fichero por app: PATH-<app>.prof o PATH/<app>.prof si es carpeta)")
+    ap.add_argument("--manifest", default=None,
+                    help="Lote multi-app: JSON/JSONL con {app, source_root, reports}; salidas en <output-dir>/<app>/")
+    ap.add_argument("--apps-parallel", type=int, default=0,
+                    help="Apps auditadas en paralelo con --manifest (0 = nº de CPUs)")
+    return ap
+
+def main():
+    args = build_parser().parse_args()
+    if args.previous and not Path(args.previous).exists():
+        # una ruta mal escrita no debe convertirse en una reauditoría completa (y de pago)
+        build_parser().error(f"--previous no existe: {args.previous}")
+    if args.manifest:
+        run_batch(args)
+        return
+    if not args.reports:
+        build_parser().error("--reports es obligatorio sin --manifest")
 
     outdir = Path(args.output_dir); outdir.mkdir(parents=True, exist_ok=True)
-    reports_dir = Path(args.reports)
     app_name = Path(os.getenv("GITHUB_REPOSITORY","openMRS")).name
 
     # Requisitos (469, con PUID y "Requirement description")
-    reqs = load_requirements(Path(args.checklist))
+    reqs = load_requirements(Path(args.checklist), None if args.no_cache else Path(args.cache_dir))
     if args.max_requirements and args.max_requirements > 0:
         reqs = reqs[: int(args.max_requirements)]
+    scan_index = None if args.no_scan_index else Path(args.cache_dir) / "scan-index.json"
+    audit_app(args, app_name, reqs, Path(args.reports), Path(args.source_root), outdir, scan_index)
+
+def audit_app(args: argparse.Namespace, app_name: str, reqs: List[Dict[str,Any]], reports_dir: Path,
+              source_root: Path, outdir: Path, scan_index: Optional[Path]) -> Dict[str,Any]:
+    """Audita una app completa y escribe sus salidas en `outdir`; devuelve un resumen para el lote."""
+    t0 = time.perf_counter()
+    outdir.mkdir(parents=True, exist_ok=True)
+    metrics = PipelineMetrics()
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
 
     # Artefactos
-    trivy = summarize_trivy(reports_dir)
-    mobsf = summarize_mobsf(reports_dir)
-    sast  = summarize_sast(reports_dir)
-    codep = scan_codebase(Path(args.source_root))
+    metrics.lap("reports")
+    reports = ReportIndex(reports_dir)
+    # Todos los hallazgos pasan por una única etapa de normalización y deduplicación
+    found = FindingSet()
+    trivy = summarize_trivy(reports, found=found)
+    mobsf = summarize_mobsf(reports, found=found)
+    sast  = summarize_sast(reports, found=found)
+    print("Findings:", json.dumps(found.stats()))
+    metrics.lap("scan")
+    scan  = scan_codebase(source_root, workers=args.scan_workers, index_path=scan_index)
+    codep = scan["counts"]
 
     client = build_openai()
     model  = args.openai_model
 
-    findings = []
-    for req in tqdm(reqs, desc="Auditing requirements"):
-        evidence = {
-            "trivy": trivy.get("summary") or trivy,
-            "mobsf": {
-                "static": mobsf.get("static",{}).get("severity_counts",{}),
-                "dynamic": bool(mobsf.get("dynamic"))
-            },
-            "sast": (sast.get("findings") or [])[:50],
-            "code": codep
-        }
-        verdict = ask_llm(client, model, req, evidence)
-        findings.append({
-            "puid": verdict.get("puid", req["id"]),
-            "id": verdict.get("puid", req["id"]),
-            "text": req["text"],
-            "status": (verdict.get("status") or "Insufficient_Evidence"),
-            "severity": (verdict.get("severity") or "unknown"),
-            "rationale": verdict.get("rationale",""),
-            "references": verdict.get("references",[]),
-            "tags": verdict.get("tags",[]),
-        })
-        time.sleep(0.03)
-
-    # Stats
-    stats = {"total": len(findings), "yes":0,"no":0,"na":0,"ins":0}
-    for f in findings:
-        s = (f["status"] or "").lower()
-        if s=="yes": stats["yes"]+=1
-        elif s=="no": stats["no"]+=1
-        elif s in ("n_a","n/a","na"): stats["na"]+=1
-        else: stats["ins"]+=1
+    limiter = RateLimiter(args.rpm, args.tpm)
+    llm_counters: Dict[str,int] = {}
+    cache = None if args.no_cache else VerdictCache(Path(args.cache_dir), args.cache_ttl_days, args.cache_max_entries)
 
-    # Persistencia
-    (outdir/"audit-findings.json").write_text(
-        json.dumps({"app": app_name, "findings": findings, "stats": stats}, ensure_ascii=False, indent=2),
-        encoding="utf-8"
-    )
+    metrics.lap("evidence_index")
+    index = EvidenceIndex.from_evidence(found, codep, scan["locations"])
+    base_evidence = {
+        "trivy": trivy.get("summary") or trivy,
+        "mobsf": {
+            "static": mobsf.get("static",{}).get("severity_counts",{}),
+            "dynamic": bool(mobsf.get("dynamic"))
+        },
+        "code": codep
+    }
+    evidence_memo: Dict[str,Dict[str,Any]] = {}
+    def evidence_for(req: Dict[str,Any]) -> Dict[str,Any]:
+        ev = evidence_memo.get(req["id"])
+        if ev is None:
+            if args.evidence_top_k <= 0:
+                # modo heredado: misma muestra global para todos los requisitos
+                found_ev = [f.as_dict() for f in (sast.get("findings") or [])[:20]]
+            else:
+                found_ev = index.query(req["text"], args.evidence_top_k)
+            # recortada aquí por elementos completos: la huella cubre exactamente lo que ve el modelo
+            ev = {**base_evidence, "findings": trim_findings(found_ev)}
+            evidence_memo[req["id"]] = ev
+        return ev
+
+    # Checkpoint: cada veredicto se persiste en cuanto llega
+    metrics.lap("plan")
+    checkpoint = Checkpoint(outdir/"audit-findings.jsonl", resume=args.resume)
+    done = checkpoint.done() if args.resume else set()
+    todo = [r for r in reqs if r["id"] not in done]
+    if done:
+        print(f"Resuming: {len(reqs) - len(todo)} requirements already in checkpoint, {len(todo)} left")
+
+    # Modo delta: se arrastran los veredictos cuya huella (texto+evidencia+modelo) no cambió
+    delta = None
+    if args.previous:
+        previous = load_previous_findings(Path(args.previous))
+        if not previous:
+            print(f"[WARN] --previous {args.previous}: no findings could be read; "
+                  f"all {len(todo)} requirements will be re-evaluated", file=sys.stderr)
+        fps = {r["id"]: evidence_fingerprint(model, r, evidence_for(r)) for r in todo}
+        reuse, todo, reasons = plan_delta(todo, fps, previous)
+        for r in reuse:
+            checkpoint.append({**previous[r["id"]], "text": r["text"]})
+        delta = {"previous": str(args.previous), "reused": len(reuse), "recomputed": len(todo),
+                 "reasons": dict(Counter(reasons.values())),
+                 "reused_puids": [r["id"] for r in reuse],
+                 "recomputed_puids": dict(reasons)}
+        (outdir/"audit-delta.json").write_text(json.dumps(delta, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Delta audit: {len(reuse)} reused, {len(todo)} recomputed {delta['reasons']}")
+    # Agrupación: un representante por grupo, evaluado con la evidencia unida de sus miembros
+    groups: Dict[str,List[tuple]] = {}
+    cluster_info = None
+    if args.cluster_threshold > 0 and len(todo) > 1:
+        clusters = cluster_requirements(todo, args.cluster_threshold, exclude=args.cluster_exclude or ())
+        groups = {c["rep"]["id"]: c["members"] for c in clusters if len(c["members"]) > 1}
+        todo = [c["rep"] for c in clusters]
+        cluster_info = {"threshold": args.cluster_threshold, "clusters": len(groups),
+                        "calls_saved": sum(len(m) - 1 for m in groups.values())}
+        print(f"Requirement clustering: {len(todo)} representatives, "
+              f"{cluster_info['calls_saved']} model calls saved")
+
+    def eval_evidence(req: Dict[str,Any]) -> Dict[str,Any]:
+        members = groups.get(req["id"])
+        if not members:
+            return evidence_for(req)
+        merged = merge_evidence([evidence_for(m) for m, _ in members])
+        return {**merged, "findings": trim_findings(merged.get("findings"))}
+
+    def record(req: Dict[str,Any], verdict: Dict[str,Any], fp: str) -> None:
+        members = groups.get(req["id"])
+        if not members:
+            checkpoint.append(make_finding(req, verdict, fp))
+            return
+        for m, sim in members:
+            trace = {"representative": req["id"], "similarity": sim, "size": len(members)}
+            # huella propia del miembro para que el modo delta lo compare con su evidencia
+            checkpoint.append(make_finding(m, {**verdict, "cluster": trace},
+                                           evidence_fingerprint(model, m, evidence_for(m))))
+
+    metrics.lap("evaluate")
+    evaluate_requirements(client, model, todo, eval_evidence,
+                          concurrency=args.concurrency, limiter=limiter,
+                          retries=args.max_retries, cache=cache,
+                          batch_size=args.batch_size, batch_tokens=args.batch_tokens,
+                          counters=llm_counters, metrics=metrics, collect=False, on_result=record)
+    checkpoint.close()
+    print("LLM calls:", json.dumps(llm_counters))
+    print("Evidence index:", json.dumps(index.stats()))
+    cache_stats = None
+    if cache:
+        cache.evict()
+        cache_stats = cache.stats()
+        cache.close()
+        print("Verdict cache:", json.dumps(cache_stats))
+
+    # Salidas finales construidas recorriendo el checkpoint en orden de requisitos
+    metrics.lap("write_json")
+    puids = [r["id"] for r in reqs]
+    stats = finding_stats(checkpoint.iter_findings(puids))
+    write_findings_json(outdir/"audit-findings.json", app_name, checkpoint.iter_findings(puids), stats)
     (outdir/"audit-summary.md").write_text(
         f"# Audit Summary – {app_name}\n\n"
         f"- Total: {stats['total']} | Yes: {stats['yes']} | No: {stats['no']} | N/a: {stats['na']} | Insufficient: {stats['ins']}\n\n"
         f"## Notes\n\n"
         f"- MobSF dynamic present: {'yes' if mobsf.get('dynamic') else 'no'}\n"
-        f"- Code patterns: {json.dumps(codep)}\n",
+        f"- Code patterns: {json.dumps(codep)}\n"
+        f"- Findings: {json.dumps(found.stats())}\n"
+        f"- Code scan: {scan['files']} files, {scan['bytes']} bytes "
+        f"({scan['rescanned']} rescanned, {scan['reused']} reused)\n"
+        + (f"- Verdict cache: {json.dumps(cache_stats)}\n" if cache_stats else "")
+        + (f"- Requirement clustering: {json.dumps(cluster_info)}\n" if cluster_info else "")
+        + (f"- Delta audit: {delta['reused']} reused, {delta['recomputed']} recomputed "
+           f"{json.dumps(delta['reasons'])}\n" if delta else ""),
         encoding="utf-8"
     )
 
     # DOCX
-    write_docx_seccat(outdir/"secm-cat_adapted.docx", app_name, findings)
-    write_docx_checklist(outdir/"checklist.docx", findings)
     top_notes = [
         f"Trivy summary keys: {list((trivy.get('summary') or {}).keys())[:5]}",
         f"MobSF severities: {mobsf.get('static',{}).get('severity_counts',{})}",
         f"SAST findings (sample): {min(50, len(sast.get('findings',[])))}",
         f"Code flags: {codep}"
     ]
-    write_docx_summary(outdir/"audit-summary.docx", app_name, stats, top_notes)
+    metrics.lap("write_docx")
+    rows = [docx_row(f) for f in checkpoint.iter_findings(puids)]
+    write_docx_reports(outdir, app_name, rows, stats, top_notes, workers=args.docx_workers)
+
+    # Histórico entre ejecuciones (consultable con scripts/findings_store.py)
+    metrics.lap("history")
+    if not args.no_history:
+        try:
+            store = FindingsStore(args.history or Path(args.cache_dir) / "history.sqlite")
+            run_id = store.start_run(app_name, "ai_correlate", model)
+            n_v = store.add_verdicts(run_id, checkpoint.iter_findings(puids))
+            n_f = store.add_findings(run_id, found)
+            store.close()
+            print(f"History: run {run_id} ({n_v} verdicts, {n_f} findings) -> {store.path}")
+        except (OSError, sqlite3.Error) as e:
+            print(f"[WARN] history store not updated: {e}", file=sys.stderr)
+
+    metrics.lap(None)
+    if profiler:
+        profiler.disable()
+        prof_path = outdir / "profile.prof" if args.profile == "-" else Path(args.profile)
+        if prof_path.is_dir():
+            prof_path = prof_path / f"{_safe_name(app_name)}.prof"
+        prof_path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(prof_path))
+        with open(prof_path.with_suffix(".txt"), "w", encoding="utf-8") as fh:
+            pstats.Stats(profiler, stream=fh).sort_stats("cumulative").print_stats(40)
+        print("Profile:", prof_path)
 
+    # Métricas junto a audit-findings.json (artefacto de CI para detectar regresiones)
+    metrics_doc = metrics.to_dict(app=app_name, requirements=len(reqs), evaluated=len(todo),
+                                  counters=llm_counters, cache=cache_stats, findings=found.stats(),
+                                  evidence_index=index.stats(),
+                                  scan={k: scan[k] for k in ("files", "bytes", "rescanned", "reused")})
+    (outdir/"metrics.json").write_text(json.dumps(metrics_doc, ensure_ascii=False, indent=2), encoding="utf-8")
+    llm_m = metrics_doc["llm"]
+    print(f"Metrics: {metrics_doc['wall_s']} s wall, {metrics_doc['cpu_s']} s CPU, "
+          f"{llm_m['tokens'].get('total_tokens', 0)} tokens, p50 {llm_m['latency_ms'].get('p50', 0)} ms, "
+          f"peak RSS {metrics_doc['peak_rss_mb'].get('self', '?')} MB")
     print("Done. Reports in:", str(outdir))
+    return {"app": app_name, "output_dir": str(outdir), "stats": stats, "findings": found.stats(),
+            "llm": llm_counters, "seconds": round(time.perf_counter() - t0, 2),
+            "metrics": {"wall_s": metrics_doc["wall_s"], "cpu_s": metrics_doc["cpu_s"],
+                        "tokens": llm_m["tokens"], "errors": llm_m["errors"],
+                        "peak_rss_mb": metrics_doc["peak_rss_mb"]},
+            "statuses": {f["puid"]: f.get("status","") for f in checkpoint.iter_findings(puids)}}
+
+# --- Modo lote: varias apps del mismo catálogo en un pool de procesos ---
+def load_manifest(path: Path) -> List[Dict[str,str]]:
+    """Entradas {app, source_root, reports} de un JSON (lista) o JSONL; rutas relativas al manifiesto.
+
+    Las entradas cuyas rutas no existen llevan "error" y no se auditan (aparecen como ERROR en el informe).
+    """
+    text = path.read_text(encoding="utf-8")
+    try:
+        raw = json.loads(text)
+    except ValueError:
+        raw = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(raw, dict):
+        raw = raw.get("apps") or []
+    base = path.parent
+    entries, names = [], set()
+    for i, e in enumerate(raw, 1):
+        if not isinstance(e, dict) or not e.get("reports"):
+            raise ValueError(f"{path}: entrada {i} sin 'reports'")
+        app = str(e.get("app") or Path(str(e["reports"])).stem)
+        if app in names:
+            raise ValueError(f"{path}: app repetida '{app}'")
+        names.add(app)
+        entry = {"app": app,
+                 "reports": str(base / e["reports"]),
+                 "source_root": str(base / (e.get("source_root") or e.get("source-root") or "."))}
+        missing = [f"{k}={entry[k]}" for k in ("reports", "source_root") if not Path(entry[k]).exists()]
+        if missing:
+            entry["error"] = "path not found: " + ", ".join(missing)
+        entries.append(entry)
+    return entries
+
+def _safe_name(app: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", app).strip("._") or "app"
+
+_BATCH: Dict[str,Any] = {}
+
+def _init_batch_worker(args: argparse.Namespace, reqs: List[Dict[str,Any]]) -> None:
+    # el catálogo ya normalizado y los regex compilados (nivel de módulo) llegan una vez por proceso
+    _BATCH["args"] = args
+    _BATCH["reqs"] = reqs
+
+def _batch_job(entry: Dict[str,str]) -> Dict[str,Any]:
+    args = argparse.Namespace(**vars(_BATCH["args"]))
+    name = _safe_name(entry["app"])
+    if args.previous:
+        # en lote, --previous es la carpeta de salida de un lote anterior
+        prev = Path(args.previous) / name / "audit-findings.json"
+        args.previous = str(prev) if prev.exists() else None
+    if args.profile and args.profile != "-" and not Path(args.profile).is_dir():
+        # un fichero por app: los procesos en paralelo no deben sobrescribirse el .prof/.txt
+        prof = Path(args.profile)
+        args.profile = str(prof.with_name(f"{prof.stem}-{name}{prof.suffix or '.prof'}"))
+    outdir = Path(args.output_dir) / name
+    outdir.mkdir(parents=True, exist_ok=True)
+    scan_index = None if args.no_scan_index else Path(args.cache_dir) / f"scan-index-{name}.json"
+    # la salida de cada app va a su propio log para no intercalar el progreso de varias
+    with open(outdir / "audit.log", "w", encoding="utf-8") as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            return audit_app(args, entry["app"], _BATCH["reqs"], Path(entry["reports"]),
+                             Path(entry["source_root"]), outdir, scan_index)
+        except Exception as e:
+            print(f"[ERROR] {entry['app']}: {e!r}")
+            return {"app": entry["app"], "output_dir": str(outdir), "error": repr(e)}
+
+def run_batch(args: argparse.Namespace) -> List[Dict[str,Any]]:
+    entries = load_manifest(Path(args.manifest))
+    order = {e["app"]: i for i, e in enumerate(entries)}
+    invalid = [e for e in entries if "error" in e]
+    entries = [e for e in entries if "error" not in e]
+    reqs = load_requirements(Path(args.checklist), None if args.no_cache else Path(args.cache_dir))
+    if args.max_requirements and args.max_requirements > 0:
+        reqs = reqs[: int(args.max_requirements)]
+    workers = max(1, min(len(entries), args.apps_parallel or (os.cpu_count() or 1)))
+    # los límites de la API son de la cuenta: cada proceso recibe su parte
+    if args.rpm > 0: args.rpm = max(1, args.rpm // workers)
+    if args.tpm > 0: args.tpm = max(1, args.tpm // workers)
+    if workers > 1:
+        args.scan_workers = args.scan_workers or max(1, (os.cpu_count() or 1) // workers)
+        args.docx_workers = 1
+    print(f"Batch: {len(entries)} apps, {len(reqs)} requirements, {workers} in parallel")
+    if not entries and not invalid:
+        print(f"[WARN] {args.manifest}: manifest without apps")
+
+    results: List[Dict[str,Any]] = [{"app": e["app"], "error": e["error"]} for e in invalid]
+    for r in results:
+        print(f"  {r['app']}: ERROR {r['error']}")
+    if workers == 1:
+        _init_batch_worker(args, reqs)
+        for e in entries:
+            results.append(_batch_job(e))
+            print(f"  {e['app']}: {'ERROR ' + results[-1]['error'] if 'error' in results[-1] else results[-1]['stats']}")
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                 initargs=(args, reqs)) as pool:
+            futs = {pool.submit(_batch_job, e): e for e in entries}
+            for fut in as_completed(futs):
+                r = fut.result()
+                results.append(r)
+                print(f"  {r['app']}: {'ERROR ' + r['error'] if 'error' in r else r['stats']}")
+    results.sort(key=lambda r: order[r["app"]])
+    Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    write_fleet_report(Path(args.output_dir), reqs, results)
+    print("Done. Fleet report in:", args.output_dir)
+    return results
+
+def write_fleet_report(outdir: Path, reqs: List[Dict[str,Any]], results: List[Dict[str,Any]]) -> None:
+    """Informe consolidado: estadísticas por app y matriz requisito × app (JSON, Markdown y DOCX)."""
+    ok = [r for r in results if "error" not in r]
+    apps = [r["app"] for r in ok]
+    matrix = [{"puid": q["id"], "text": q["text"], "status": {r["app"]: r["statuses"].get(q["id"], "") for r in ok}}
+              for q in reqs]
+    failing = [m for m in matrix if any(str(s).lower() == "no" for s in m["status"].values())]
+    summary = {"apps": [{k: v for k, v in r.items() if k != "statuses"} for r in results],
+               "totals": {k: sum(r["stats"][k] for r in ok) for k in ("total","yes","no","na","ins")},
+               "failing_in_any_app": [m["puid"] for m in failing],
+               "requirements": matrix}
+    (outdir/"fleet-summary.json").write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    lines = [f"# Fleet Audit Summary – {len(results)} apps", "",
+             "| App | Total | Yes | No | N/a | Insufficient | Findings | Seconds |",
+             "|---|---|---|---|---|---|---|---|"]
+    for r in results:
+        if "error" in r:
+            lines.append(f"| {r['app']} | ERROR: {r['error']} | | | | | | |")
+            continue
+        st = r["stats"]
+        lines.append(f"| {r['app']} | {st['total']} | {st['yes']} | {st['no']} | {st['na']} | {st['ins']} "
+                     f"| {r['findings']['unique']} | {r['seconds']} |")
+    lines += ["", f"## Requirements failing in at least one app ({len(failing)})", ""]
+    lines += [f"- {m['puid']}: " + ", ".join(a for a, s in m["status"].items() if str(s).lower() == "no")
+              for m in failing]
+    (outdir/"fleet-summary.md").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    doc = Document()
+    doc.add_heading("Fleet Compliance Matrix – SEC-CAT*", level=0)
+    doc.add_paragraph(f"Applications: {', '.join(apps)}")
+    table = doc.add_table(rows=1, cols=2 + len(apps))
+    for cell, title in zip(table.rows[0].cells, ["PUID", "Requirement"] + apps):
+        cell.text = title
+    append_table_rows(table, ([m["puid"], m["text"]] + [m["status"][a] for a in apps] for m in matrix))
+    doc.save(outdir/"fleet-summary.docx")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for loading the requirements catalogue.
+
+Each mode runs in a fresh interpreter and reports the load time and peak RSS:
+"json" parses requisitos.json and normalizes it the way both scripts used to,
+"cold" compiles the SQLite catalogue from scratch and "warm" reads an
+up-to-date compiled catalogue.
+
+Usage:
+    python scripts/bench/bench_catalogue.py --repeat 5
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+CHECKLIST = HERE.parents[1] / 'requirements' / 'requisitos.json'
+
+CHILD = {
+    'json': 'import json; from catalogue import normalize_requirement; '
+            'reqs = [normalize_requirement(d, i) for i, d in enumerate(json.load(open(P, encoding="utf-8")), 1)]',
+    'cold': 'import os, catalogue; os.path.exists(C) and os.remove(C); '
+            'reqs = catalogue.load_catalogue(P, C).requirements()',
+    'warm': 'import catalogue; reqs = catalogue.load_catalogue(P, C).requirements()',
+}
+
+
+def run(mode: str, cache: Path) -> tuple:
+    code = ('import sys, time, resource; sys.path.insert(0, %r); P, C = %r, %r; '
+            'base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss; t = time.perf_counter(); %s; '
+            'dt = time.perf_counter() - t; '
+            'print(len(reqs), dt, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base)'
+            % (str(HERE.parent), str(CHECKLIST), str(cache), CHILD[mode]))
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    n, dt, rss = out.stdout.split()
+    return int(n), float(dt), int(rss)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description='Benchmark catalogue loading')
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        cache = Path(d) / 'catalogue.sqlite'
+        for mode in ('json', 'cold', 'warm'):
+            runs = [run(mode, cache) for _ in range(args.repeat)]
+            ms = statistics.median(r[1] for r in runs) * 1000
+            rss = statistics.median(r[2] for r in runs) / 1024
+            print(f'{mode:<5} {runs[0][0]} requirements  {ms:7.1f} ms  +{rss:5.1f} MB peak RSS')
+
+
+if __name__ == '__main__':
+    main()
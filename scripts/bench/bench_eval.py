@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark the requirement evaluation loop of ai_correlate.py against the local
+chat-completions stub.
+
+Runs the same requirement set sequentially and with increasing concurrency and
+prints wall-clock time, throughput and speed-up for each configuration.
+
+Usage:
+    python scripts/bench/bench_eval.py --requirements 469 --latency 0.25 --concurrency 1 8 16
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+sys.path.insert(0, str(HERE))
+
+import llm_stub  # noqa: E402
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description='Benchmark ai_correlate evaluation loop')
+    ap.add_argument('--checklist', default=str(HERE.parents[1] / 'requirements' / 'requisitos.json'))
+    ap.add_argument('--requirements', type=int, default=120)
+    ap.add_argument('--latency', type=float, default=0.25)
+    ap.add_argument('--error-rate', type=float, default=0.02)
+    ap.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8, 16])
+    ap.add_argument('--rpm', type=int, default=0)
+    ap.add_argument('--tpm', type=int, default=0)
+    args = ap.parse_args()
+
+    server = llm_stub.serve(0, args.latency, 0.05, args.error_rate)
+    os.environ['OPENAI_BASE_URL'] = f'http://127.0.0.1:{server.server_port}/v1'
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+
+    import ai_correlate as ac
+
+    client = ac.build_openai()
+    if client is None:
+        sys.exit('openai package not available')
+    reqs = ac.load_requirements(Path(args.checklist))[: args.requirements]
+    evidence = {'trivy': {}, 'mobsf': {}, 'sast': [], 'code': {k: 0 for k in ac.PATTERNS}}
+
+    baseline = None
+    print(f'{"concurrency":>11} {"seconds":>8} {"req/s":>7} {"speed-up":>8} {"errors":>6}')
+    for c in args.concurrency:
+        t0 = time.perf_counter()
+        verdicts = ac.evaluate_requirements(client, 'stub', reqs, lambda r: evidence,
+                                            concurrency=c, limiter=ac.RateLimiter(args.rpm, args.tpm),
+                                            desc=f'c={c}')
+        dt = time.perf_counter() - t0
+        baseline = baseline or dt
+        errors = sum(1 for v in verdicts if str(v.get('rationale', '')).startswith('AI error'))
+        print(f'{c:>11} {dt:>8.2f} {len(reqs) / dt:>7.1f} {baseline / dt:>7.1f}x {errors:>6}')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Peak-memory benchmark for report ingestion.
+
+Generates a synthetic SARIF file and a synthetic Trivy report of roughly the
+requested size (see synth.py), then runs each reader in a fresh subprocess and
+reports wall time and peak RSS (ru_maxrss).  The generators write
+incrementally because Linux keeps ru_maxrss across exec, so a bloated parent
+would skew the children.  "full" loads the whole document the way the
+scripts used to; "stream" goes through reports_io (and, for SARIF, reports the
+distinct findings kept after deduplication).
+
+Usage:
+    python scripts/bench/bench_ingest.py --mb 200
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+sys.path.insert(0, str(HERE))
+
+from synth import write_sarif, write_trivy  # noqa: E402
+
+
+CHILD = {
+    'sarif-full': 'import ai_correlate as ac, orjson; js = orjson.loads(open(P, "rb").read()); '
+                  'n = sum(len(r.get("results") or []) for r in js["runs"])',
+    'sarif-stream': 'import ai_correlate as ac, reports_io as rio, pathlib; '
+                    'n = len(ac.summarize_sast(rio.ReportIndex(pathlib.Path(P).parent))["findings"])',
+    'trivy-full': 'import recolectar_datos as rd, json; js = json.load(open(P)); '
+                  'n = sum(len(r.get("Vulnerabilities") or []) for r in js["Results"])',
+    'trivy-stream': 'import recolectar_datos as rd; n = len(rd.parse_trivy_results(P))',
+}
+
+
+def run_child(name: str, path: Path) -> None:
+    code = ('import sys, resource, time; sys.path.insert(0, %r); P = %r; t = time.perf_counter(); %s; '
+            'print(n, time.perf_counter() - t, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)'
+            % (str(HERE.parent), str(path), CHILD[name]))
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    if out.returncode:
+        print(f'{name:<13} failed: {out.stderr.strip().splitlines()[-1]}')
+        return
+    n, dt, rss = out.stdout.split()
+    print(f'{name:<13} items={int(n):>9}  {float(dt):7.2f} s  peak RSS {int(rss) / 1024:8.1f} MB')
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description='Benchmark report ingestion memory')
+    ap.add_argument('--mb', type=int, default=100)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        sarif = Path(d) / 'sarif' / 'merged.sarif'
+        trivy = Path(d) / 'trivy' / 'trivy.json'
+        sarif.parent.mkdir()
+        trivy.parent.mkdir()
+        t0 = time.perf_counter()
+        write_sarif(sarif, args.mb)
+        write_trivy(trivy, args.mb)
+        print(f'generated {sarif.stat().st_size >> 20} MB SARIF, {trivy.stat().st_size >> 20} MB Trivy '
+              f'in {time.perf_counter() - t0:.1f} s')
+        for name, path in (('sarif-full', sarif), ('sarif-stream', sarif),
+                           ('trivy-full', trivy), ('trivy-stream', trivy)):
+            run_child(name, path)
+
+
+if __name__ == '__main__':
+    main()
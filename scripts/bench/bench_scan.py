@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark scan_codebase against the previous rglob/per-pattern scanner.
+
+The legacy scanner is reproduced here without its 2 MB cut-off so both
+implementations read the same files.  Throughput is reported in files/s and
+MB/s for each source root.
+
+Usage:
+    python scripts/bench/bench_scan.py openmrs-client openmrs-android-sdk --workers 1 4
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+
+import ai_correlate as ac  # noqa: E402
+
+
+def legacy_scan(root: Path) -> Dict[str, int]:
+    """Previous implementation: rglob + one uncompiled regex search per pattern."""
+    totals = {k: 0 for k in ac.PATTERNS}
+    for p in root.rglob('*'):
+        if not p.is_file() or p.suffix.lower() not in ac.CODE_EXT:
+            continue
+        txt = p.read_bytes().decode('utf-8', errors='ignore')
+        for name, rx in ac.PATTERNS.items():
+            if re.search(rx, txt, flags=re.IGNORECASE | re.MULTILINE):
+                totals[name] += 1
+    return totals
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description='Benchmark scan_codebase')
+    ap.add_argument('roots', nargs='*', default=['openmrs-client', 'openmrs-android-sdk'])
+    ap.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+
+    for root in map(Path, args.roots):
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            legacy = legacy_scan(root)
+        dt = (time.perf_counter() - t0) / args.repeat
+        print(f'{root}: legacy {dt * 1000:8.1f} ms')
+        for w in args.workers:
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                res = ac.scan_codebase(root, workers=w)
+            dt = (time.perf_counter() - t0) / args.repeat
+            same = 'same counts' if res['counts'] == legacy else f'counts differ: {res["counts"]} vs {legacy}'
+            print(f'{root}: workers={w:<2} {dt * 1000:8.1f} ms  {res["files"] / dt:8.0f} files/s  '
+                  f'{res["bytes"] / dt / 1e6:6.1f} MB/s  ({same})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI chat-completions endpoint.
+
+Answers ``POST /v1/chat/completions`` with a canned verdict for the requirement
+ID found in the prompt, after a configurable latency.  A fraction of requests
+can be answered with HTTP 429/500 to exercise the client's retry path.
+
+Usage:
+    python scripts/bench/llm_stub.py --port 8765 --latency 0.25 --error-rate 0.05
+
+Point the audit at it with ``OPENAI_BASE_URL=http://127.0.0.1:8765/v1`` and
+any non-empty ``OPENAI_API_KEY``.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Tuple
+
+ID_RE = re.compile(r"^ID:\s*(\S+)", re.MULTILINE)
+
+
+def make_handler(latency: float, jitter: float, error_rate: float):
+    """Build a request handler class bound to the given timing parameters."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        stats: Dict[str, int] = {'requests': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def log_message(self, *args: Any) -> None:  # keep benchmarks quiet
+            pass
+
+        def _send(self, code: int, body: Dict[str, Any], headers: Dict[str, str] = None) -> None:
+            raw = json.dumps(body).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(raw)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            with self.lock:
+                self.stats['requests'] += 1
+            time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+            if error_rate and random.random() < error_rate:
+                with self.lock:
+                    self.stats['errors'] += 1
+                code = random.choice((429, 500, 503))
+                self._send(code, {'error': {'message': 'stub error', 'type': 'stub'}},
+                           {'retry-after': '0'} if code == 429 else None)
+                return
+            prompt = '\n'.join(str(m.get('content', '')) for m in payload.get('messages', []))
+            content, usage = render_completion(prompt)
+            self._send(200, {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': payload.get('model', 'stub'),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': content}}],
+                'usage': usage,
+            })
+
+    return Handler
+
+
+def render_completion(prompt: str) -> Tuple[str, Dict[str, int]]:
+    """Return a JSON verdict (or array of verdicts) for every ID in the prompt."""
+    ids = ID_RE.findall(prompt) or ['REQ-0000']
+    verdicts = [{
+        'puid': puid,
+        'status': random.choice(['Yes', 'No', 'N_a', 'Insufficient_Evidence']),
+        'severity': random.choice(['high', 'medium', 'low', 'unknown']),
+        'rationale': 'Stub verdict.',
+        'references': ['stub'],
+        'tags': ['stub'],
+    } for puid in ids]
+    content = json.dumps(verdicts[0] if len(verdicts) == 1 else verdicts)
+    usage = {'prompt_tokens': len(prompt) // 4 + 1, 'completion_tokens': len(content) // 4 + 1}
+    usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+    return content, usage
+
+
+def serve(port: int = 0, latency: float = 0.25, jitter: float = 0.05,
+          error_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Start the stub in a daemon thread and return the server (``server_port`` holds the port)."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(latency, jitter, error_rate))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--port', type=int, default=8765)
+    ap.add_argument('--latency', type=float, default=0.25)
+    ap.add_argument('--jitter', type=float, default=0.05)
+    ap.add_argument('--error-rate', type=float, default=0.0)
+    args = ap.parse_args()
+    server = serve(args.port, args.latency, args.jitter, args.error_rate)
+    print(f'LLM stub on http://127.0.0.1:{server.server_port}/v1')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
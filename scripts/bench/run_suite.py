@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the audit scripts.
+
+Generates synthetic reports and a source tree (see synth.py), then runs each
+case in a fresh interpreter and reports wall time, throughput and peak RSS:
+
+- load_json_any      whole-document load of the Trivy report
+- summarize_trivy / summarize_mobsf / summarize_sast
+- scan_codebase      cold scan of the synthetic source tree (no index)
+- evaluate           requirement evaluation loop against the local LLM stub
+- recolectar_main    recolectar_datos.main() over the reports directory
+- recolectar_split   the same with --compact --data-dir (split OPA data documents)
+- docx               the three DOCX reports for a synthetic finding list
+
+Peak RSS is ru_maxrss of the child; "+RSS" is the growth over the RSS after
+imports.  Inputs are written incrementally so the parent stays small (Linux
+keeps ru_maxrss across exec).
+
+Usage:
+    python scripts/bench/run_suite.py --mb 100 --source-mb 50
+    python scripts/bench/run_suite.py --data /tmp/bench-data --cases summarize_sast scan_codebase --json out.json
+"""
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parents[1]
+sys.path.insert(0, str(HERE))
+
+import synth  # noqa: E402
+
+# name -> (setup, operation, input files relative to the reports dir).  The
+# operation sets `n` (records or files processed) and may set `nbytes`.
+CASES: Dict[str, tuple] = {
+    'load_json_any': (
+        'import ai_correlate as ac',
+        'js = ac.load_json_any(pathlib.Path(R) / "trivy_results.json"); '
+        'n = sum(len(r.get("Vulnerabilities") or []) for r in js["Results"])',
+        ['trivy_results.json']),
+    'summarize_trivy': (
+        'import ai_correlate as ac, reports_io as rio; idx = rio.ReportIndex(R)',
+        'n = ac.summarize_trivy(idx)["summary"]["vulnerabilities"]',
+        ['trivy_results.json']),
+    'summarize_mobsf': (
+        'import ai_correlate as ac, reports_io as rio; idx = rio.ReportIndex(R)',
+        'n = len(ac.summarize_mobsf(idx)["findings"])',
+        ['mobsf_static_results.json', 'mobsf_dynamic_results.json']),
+    'summarize_sast': (
+        'import ai_correlate as ac, reports_io as rio; idx = rio.ReportIndex(R)',
+        'n = len(ac.summarize_sast(idx)["findings"])',
+        ['merged.sarif']),
+    'scan_codebase': (
+        'import ai_correlate as ac',
+        'res = ac.scan_codebase(pathlib.Path(S), workers=A.scan_workers); n = res["files"]; nbytes = res["bytes"]',
+        []),
+    'evaluate': (
+        'import os, llm_stub; srv = llm_stub.serve(0, A.latency, A.latency / 5, A.error_rate); '
+        'os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{srv.server_port}/v1"; '
+        'os.environ.setdefault("OPENAI_API_KEY", "stub"); import ai_correlate as ac; '
+        'client = ac.build_openai(); assert client, "openai package not available"; '
+        'reqs = (ac.load_requirements(pathlib.Path(A.checklist)) * 50)[:A.requirements]; '
+        'reqs = [dict(r, id=f"{r[\'id\']}#{i}") for i, r in enumerate(reqs)]; '
+        'ev = {"trivy": {}, "mobsf": {}, "findings": [], "code": {}}',
+        'ac.evaluate_requirements(client, "stub", reqs, lambda r: ev, concurrency=A.concurrency, '
+        'limiter=ac.RateLimiter(0, 0), collect=False, desc="bench"); n = len(reqs)',
+        []),
+    'recolectar_main': (
+        'import os, json, recolectar_datos as rd; os.chdir(W); sys.argv = ["recolectar_datos.py", "--reports", R]',
+        'rd.main(); n = sum(len(v) for v in json.load(open("input.json")).values() if isinstance(v, list))',
+        list(synth.GENERATORS)),
+    'recolectar_split': (
+        'import os, json, recolectar_datos as rd; os.chdir(W); '
+        'sys.argv = ["recolectar_datos.py", "--reports", R, "--compact", "--data-dir", "opa-data"]',
+        'rd.main(); n = sum(s["total"] for s in json.load(open("input.json"))["vulnerability_summary"].values())',
+        list(synth.GENERATORS)),
+    'docx': (
+        'import ai_correlate as ac; '
+        'rows = [{"puid": f"SECM-CAT-{i:05d}", "text": "Requirement text " * 12, '
+        '"status": ("Yes", "No", "N_a", "Insufficient_Evidence")[i % 4], "severity": "high"} '
+        'for i in range(A.docx_rows)]; stats = ac.finding_stats(rows)',
+        'ac.write_docx_reports(pathlib.Path(W), "bench", rows, stats, ["note"], workers=1); n = len(rows)',
+        []),
+}
+
+CHILD = '''
+import sys, json, time, pathlib, resource, argparse
+sys.path[:0] = [{scripts!r}, {bench!r}]
+A = argparse.Namespace(**json.loads({args!r}))
+R, S, W = A.reports, A.source, A.work
+{setup}
+nbytes = 0
+base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t = time.perf_counter()
+{op}
+dt = time.perf_counter() - t
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print("@@" + json.dumps({{"n": n, "seconds": dt, "nbytes": nbytes, "base_kb": base, "peak_kb": peak}}))
+'''
+
+
+def run_case(name: str, args: argparse.Namespace, data: Path) -> Optional[dict]:
+    setup, op, inputs = CASES[name]
+    work = Path(tempfile.mkdtemp(prefix=f'bench-{name}-'))
+    (work / 'requirements').mkdir()
+    shutil.copy(args.checklist, work / 'requirements' / 'requisitos.json')
+    params = {**vars(args), 'reports': str(data / 'reports'), 'source': str(data / 'src'), 'work': str(work)}
+    code = CHILD.format(scripts=str(HERE.parent), bench=str(HERE), args=json.dumps(params), setup=setup, op=op)
+    try:
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=str(work))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    lines = [ln for ln in out.stdout.splitlines() if ln.startswith('@@')]
+    if out.returncode or not lines:
+        err = (out.stderr.strip().splitlines() or ['no output'])[-1]
+        print(f'{name:<16} failed: {err}')
+        return None
+    res = json.loads(lines[-1][2:])
+    res['nbytes'] = res['nbytes'] or sum((data / 'reports' / f).stat().st_size for f in inputs)
+    res['case'] = name
+    return res
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description='Offline benchmark suite for the audit scripts')
+    ap.add_argument('--data', help='Reuse/keep generated inputs in this directory')
+    ap.add_argument('--mb', type=float, default=20, help='Approximate size of each synthetic report (MB)')
+    ap.add_argument('--source-mb', type=float, default=20, help='Size of the synthetic source tree (MB)')
+    ap.add_argument('--source-files', type=int, default=2000)
+    ap.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    ap.add_argument('--checklist', default=str(ROOT / 'requirements' / 'requisitos.json'))
+    ap.add_argument('--requirements', type=int, default=469, help='Requirements in the evaluate case')
+    ap.add_argument('--concurrency', type=int, default=8)
+    ap.add_argument('--latency', type=float, default=0.05, help='Stub latency per request (s)')
+    ap.add_argument('--error-rate', type=float, default=0.02, help='Fraction of stub requests answered 429/5xx')
+    ap.add_argument('--scan-workers', type=int, default=1)
+    ap.add_argument('--docx-rows', type=int, default=5000)
+    ap.add_argument('--json', help='Also write the results to this JSON file')
+    args = ap.parse_args()
+
+    tmp = None
+    data = Path(args.data) if args.data else Path(tempfile.mkdtemp(prefix='bench-data-'))
+    if not args.data:
+        tmp = data
+    try:
+        if not (data / 'reports').is_dir():
+            t0 = time.perf_counter()
+            synth.write_reports(data / 'reports', args.mb)
+            synth.write_source_tree(data / 'src', args.source_mb, args.source_files)
+            print(f'generated inputs in {data} ({time.perf_counter() - t0:.1f} s)')
+        print(f'{"case":<16} {"items":>9} {"seconds":>8} {"MB/s":>8} {"items/s":>10} {"peak RSS":>9} {"+RSS":>8}')
+        results: List[dict] = []
+        for name in args.cases:
+            r = run_case(name, args, data)
+            if not r:
+                continue
+            results.append(r)
+            mbps = f'{r["nbytes"] / (1 << 20) / r["seconds"]:.1f}' if r['nbytes'] else '-'
+            print(f'{name:<16} {r["n"]:>9} {r["seconds"]:>8.2f} {mbps:>8} {r["n"] / r["seconds"]:>10.0f} '
+                  f'{r["peak_kb"] / 1024:>7.1f}MB {(r["peak_kb"] - r["base_kb"]) / 1024:>6.1f}MB')
+        if args.json:
+            Path(args.json).write_text(json.dumps({'params': vars(args), 'results': results}, indent=2),
+                                       encoding='utf-8')
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Synthetic inputs for the benchmarks.
+
+Writes scanner reports shaped like the real artifacts of the workflow (Trivy,
+MobSF static and dynamic, SARIF, dependency results) at a requested size, and
+a synthetic Android source tree for `scan_codebase`.  Reports are written
+incrementally from a small pool of distinct records, so generating a 1 GB file
+needs only a few MB of memory; the pool also repeats identifiers and locations
+so deduplication and caps see realistic input.
+
+Usage:
+    python scripts/bench/synth.py OUT_DIR --mb 50 --source-mb 20
+"""
+
+import argparse
+import json
+import random
+import time
+from itertools import cycle, islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, TextIO
+
+POOL = 512
+SEVERITIES = ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW', 'UNKNOWN']
+PACKAGES = ['okhttp', 'retrofit', 'gson', 'jackson-databind', 'bcprov-jdk15on', 'commons-io', 'guava',
+            'androidx.core', 'sqlcipher', 'log4j-core', 'protobuf-java', 'netty-codec']
+RULES = [('java/android/webview-javascript-enabled', 79), ('java/insecure-trustmanager', 295),
+         ('java/android/cleartext-storage-shared-prefs', 312), ('java/sql-injection', 89),
+         ('java/hardcoded-credential-api-call', 798), ('java/android/intent-redirection', 940),
+         ('kotlin.lang.security.weak-rsa', 326), ('java/weak-cryptographic-algorithm', 327)]
+FILES = [f'openmrs-client/src/main/java/org/openmrs/mobile/{d}/{n}.java'
+         for d in ('activities', 'api', 'dao', 'utilities', 'security') for n in ('A', 'B', 'C', 'D', 'E', 'F')]
+
+
+def write_items(f: TextIO, chunks: List[str], n: int, batch: int = 1000) -> None:
+    """Write `n` comma-separated records, cycling through `chunks`, without building them in memory."""
+    src = cycle(chunks)
+    written = 0
+    while written < n:
+        k = min(batch, n - written)
+        f.write((',' if written else '') + ','.join(islice(src, k)))
+        written += k
+
+
+def _count(target_mb: float, chunks: List[str], parts: int = 1) -> int:
+    avg = sum(len(c) for c in chunks) / len(chunks) + 1
+    return max(1, int(target_mb * (1 << 20) / avg / parts))
+
+
+def _pad(rnd: random.Random, n: int) -> str:
+    words = ['insecure', 'certificate', 'storage', 'token', 'activity', 'exported', 'crypto', 'network',
+             'intent', 'permission', 'webview', 'logging', 'backup', 'debuggable', 'cleartext']
+    return ' '.join(rnd.choice(words) for _ in range(n // 8))
+
+
+def write_trivy(path: Path, target_mb: float, seed: int = 1) -> int:
+    """Trivy JSON report (``Results[].Vulnerabilities[]``); returns the number of vulnerabilities."""
+    rnd = random.Random(seed)
+    chunks = [json.dumps({
+        'VulnerabilityID': f'CVE-20{rnd.randint(15, 25)}-{rnd.randint(1000, 99999)}',
+        'PkgName': rnd.choice(PACKAGES), 'InstalledVersion': f'{rnd.randint(1, 5)}.{rnd.randint(0, 20)}.0',
+        'FixedVersion': f'{rnd.randint(5, 9)}.0.0', 'Severity': rnd.choice(SEVERITIES),
+        'CweIDs': [f'CWE-{rnd.choice(RULES)[1]}'], 'Title': _pad(rnd, 120), 'Description': _pad(rnd, 700),
+    }) for _ in range(POOL)]
+    targets = 4
+    n = _count(target_mb, chunks, targets)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"SchemaVersion":2,"ArtifactName":".","ArtifactType":"filesystem","Results":[')
+        for t in range(targets):
+            f.write(('' if t == 0 else ',') + '{"Target":"module-%d/build.gradle","Class":"lang-pkgs",'
+                    '"Type":"gradle","Vulnerabilities":[' % t)
+            write_items(f, chunks, n)
+            f.write(']}')
+        f.write(']}')
+    return n * targets
+
+
+def write_dependency(path: Path, target_mb: float, seed: int = 2) -> int:
+    """Generic dependency scanner report (``vulnerabilities[]``)."""
+    rnd = random.Random(seed)
+    chunks = [json.dumps({
+        'id': f'GHSA-{rnd.randint(1000, 9999):04x}-{rnd.randint(1000, 9999):04x}-{rnd.randint(1000, 9999):04x}',
+        'package': rnd.choice(PACKAGES), 'version': f'{rnd.randint(1, 5)}.0', 'severity': rnd.choice(SEVERITIES).lower(),
+        'cwes': [f'CWE-{rnd.choice(RULES)[1]}'], 'title': _pad(rnd, 100), 'description': _pad(rnd, 500),
+    }) for _ in range(POOL)]
+    n = _count(target_mb, chunks)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"vulnerabilities":[')
+        write_items(f, chunks, n)
+        f.write(']}')
+    return n
+
+
+def write_sarif(path: Path, target_mb: float, seed: int = 3, runs: int = 4) -> int:
+    """SARIF 2.1.0 log with `runs` tool runs that report overlapping results."""
+    rnd = random.Random(seed)
+    chunks = []
+    for _ in range(POOL):
+        rule, cwe = rnd.choice(RULES)
+        chunks.append(json.dumps({
+            'ruleId': rule, 'level': rnd.choice(['error', 'warning', 'note']),
+            'message': {'text': _pad(rnd, 200)},
+            'locations': [{'physicalLocation': {'artifactLocation': {'uri': rnd.choice(FILES)},
+                                                'region': {'startLine': rnd.randint(1, 400)}}}],
+            'properties': {'tags': ['security', f'external/cwe/cwe-{cwe:03d}']},
+        }))
+    n = _count(target_mb, chunks, runs)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"$schema":"https://json.schemastore.org/sarif-2.1.0.json","version":"2.1.0","runs":[')
+        for r in range(runs):
+            f.write(('' if r == 0 else ',') + '{"tool":{"driver":{"name":"%s","rules":[]}},"results":['
+                    % ('CodeQL', 'Semgrep', 'Detekt', 'MobSF-SAST')[r % 4])
+            write_items(f, chunks, n)
+            f.write(']}')
+        f.write(']}')
+    return n * runs
+
+
+def write_mobsf_static(path: Path, target_mb: float, seed: int = 4) -> int:
+    """MobSF static report; most of the bytes are in the heavy ``strings``/``files`` sections, as in real scans."""
+    rnd = random.Random(seed)
+    issues = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"title":"Static Analysis","app_name":"OpenMRS","package_name":"org.openmrs.mobile",'
+                '"version_name":"3.0.0","security_score":42,"manifest_analysis":[')
+        manifest = [json.dumps({'rule': f'manifest_{i}', 'title': _pad(rnd, 60),
+                                'severity': rnd.choice(['high', 'warning', 'info']), 'description': _pad(rnd, 300)})
+                    for i in range(60)]
+        f.write(','.join(manifest))
+        f.write('],"code_analysis":{')
+        code = []
+        for i in range(400):
+            rule, cwe = rnd.choice(RULES)
+            code.append(json.dumps(f'{rule}_{i}') + ':' + json.dumps({
+                'files': {rnd.choice(FILES): ','.join(str(rnd.randint(1, 400)) for _ in range(5))},
+                'metadata': {'severity': rnd.choice(['high', 'warning', 'info', 'secure']),
+                             'description': _pad(rnd, 200), 'cwe': f'CWE-{cwe}: {_pad(rnd, 30)}',
+                             'owasp-mobile': 'M2: Insecure Data Storage', 'masvs': 'MSTG-STORAGE-14'}}))
+        f.write(','.join(code))
+        issues = len(manifest) + len(code)
+        f.write('},"certificate_analysis":{"certificate_info":' + json.dumps(_pad(rnd, 2000)) +
+                ',"certificate_findings":[["info","Application is signed with v2 signature","Signed"]]},'
+                '"strings":{"strings_apk_res":[')
+        strings = [json.dumps(f'"string_{i}" : "{_pad(rnd, 80)}"') for i in range(POOL)]
+        files = [json.dumps(f'res/drawable-{i % 7}/image_{i}.png') for i in range(POOL)]
+        body = max(1, _count(max(target_mb - 0.5, 0.1), strings + files) // 2)
+        write_items(f, strings, body)
+        f.write(']},"files":[')
+        write_items(f, files, body)
+        f.write(']}')
+    return issues
+
+
+def write_mobsf_dynamic(path: Path, target_mb: float, seed: int = 5) -> int:
+    """MobSF dynamic report with API-monitor and network findings."""
+    rnd = random.Random(seed)
+    chunks = [json.dumps({'title': _pad(rnd, 50), 'severity': rnd.choice(['high', 'medium', 'info']),
+                          'description': _pad(rnd, 300), 'class': 'okhttp3.OkHttpClient',
+                          'arguments': _pad(rnd, 200)}) for _ in range(POOL)]
+    n = _count(target_mb, chunks)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"title":"Dynamic Analysis","package":"org.openmrs.mobile","api_monitor":[')
+        write_items(f, chunks, n)
+        f.write('],"tls_tests":{"tls_misconfigured":false,"pinning_bypass":true}}')
+    return n
+
+
+KOTLIN_SNIPPETS = [
+    'val client = OkHttpClient.Builder().hostnameVerifier { _, _ -> true }.build()\n',
+    'webView.settings.setJavaScriptEnabled(true)\n',
+    'webView.addJavascriptInterface(bridge, "Android")\n',
+    'val url = "http://demo.openmrs.org/openmrs/ws/rest/v1"\n',
+    'private const val api_key = "AbCdEfGhIjKlMnOpQrSt"\n',
+]
+
+
+def write_source_tree(root: Path, target_mb: float, files: int = 2000, hit_rate: float = 0.05, seed: int = 6) -> int:
+    """Android-like tree of .kt/.java/.xml files totalling about `target_mb` MB; returns the file count."""
+    rnd = random.Random(seed)
+    per_file = max(200, int(target_mb * (1 << 20) / files))
+    filler = ''.join(f'    fun method{i}(value: Int): Int = value * {i} + helper(value)\n' for i in range(200))
+    manifest = '<activity android:name=".MainActivity" android:exported="true"/>\n'
+    for i in range(files):
+        ext = ('.kt', '.java', '.xml')[i % 3]
+        d = root / 'app' / 'src' / 'main' / ('res/layout' if ext == '.xml' else f'java/org/openmrs/pkg{i % 40}')
+        d.mkdir(parents=True, exist_ok=True)
+        body = (filler * (per_file // len(filler) + 1))[:per_file]
+        if rnd.random() < hit_rate:
+            body += manifest if ext == '.xml' else rnd.choice(KOTLIN_SNIPPETS)
+        (d / f'File{i}{ext}').write_text(body, encoding='utf-8')
+    return files
+
+
+GENERATORS: Dict[str, Callable[[Path, float], int]] = {
+    'trivy_results.json': write_trivy,
+    'dependency_results.json': write_dependency,
+    'merged.sarif': write_sarif,
+    'mobsf_static_results.json': write_mobsf_static,
+    'mobsf_dynamic_results.json': write_mobsf_dynamic,
+}
+
+
+def write_reports(outdir: Path, target_mb: float, kinds: Iterable[str] = GENERATORS) -> Dict[str, int]:
+    """Write one report of each kind into `outdir`; returns ``{file name: records}``."""
+    outdir.mkdir(parents=True, exist_ok=True)
+    return {name: GENERATORS[name](outdir / name, target_mb) for name in kinds}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description='Generate synthetic scanner reports and a source tree')
+    ap.add_argument('outdir')
+    ap.add_argument('--mb', type=float, default=10, help='Approximate size of each report')
+    ap.add_argument('--source-mb', type=float, default=0, help='Size of the synthetic source tree (0 = none)')
+    ap.add_argument('--source-files', type=int, default=2000)
+    args = ap.parse_args()
+    out = Path(args.outdir)
+    t0 = time.perf_counter()
+    for name, n in write_reports(out / 'reports', args.mb).items():
+        print(f'{name:<28} {(out / "reports" / name).stat().st_size / (1 << 20):8.1f} MB  {n:>9} records')
+    if args.source_mb:
+        n = write_source_tree(out / 'src', args.source_mb, args.source_files)
+        print(f'{"source tree":<28} {args.source_mb:8.1f} MB  {n:>9} files')
+    print(f'generated in {time.perf_counter() - t0:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
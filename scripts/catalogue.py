@@ -0,0 +1,149 @@
+"""
+Compiled SECM-CAT requirements catalogue shared by the audit scripts.
+
+`requirements/requisitos.json` is a 1.3 MB list of requirement records whose
+long free-text fields (`Source`, `Rationale`, ...) are not needed to run an
+audit.  `load_catalogue` parses it once into a small SQLite file indexed by
+PUID and keyed on the SHA-256 of the JSON source; later runs read only the
+PUIDs and normalized requirement texts and fetch the full record lazily.
+If the cache cannot be written, the catalogue is built in memory instead.
+
+All requirement normalization (PUID and text fallbacks) lives in
+`normalize_requirement` so both entry points see the same view.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+DEFAULT_CACHE = os.path.join('.ai-cache', 'catalogue.sqlite')
+SCHEMA_VERSION = '1'
+
+# Preferred fields for the requirement text, in order.
+TEXT_FIELDS = ('Requirement description', 'Requirement', 'requirement', 'controles',
+               'description', 'Description', 'text', 'Text')
+
+
+def normalize_requirement(record: Dict[str, Any], position: int) -> Dict[str, str]:
+    """Return the `{'id', 'text'}` view of a raw catalogue record.
+
+    `position` is the 1-based index of the record and is used to build a
+    `REQ-nnnn` identifier when the record has no PUID.
+    """
+    puid = record.get('PUID') or record.get('puid') or record.get('id') or f'REQ-{position:04d}'
+    text = next((record[k] for k in TEXT_FIELDS if record.get(k)), '')
+    if not str(text).strip():
+        # short concatenation of the scalar fields as a last resort
+        text = ' '.join(str(v) for v in record.values() if isinstance(v, (str, int, float)))[:2000]
+    return {'id': str(puid).strip(), 'text': str(text).strip()}
+
+
+def _records(raw: Any) -> List[Tuple[int, Dict[str, Any]]]:
+    """(1-based position, record) pairs; positions count skipped non-object entries too."""
+    if isinstance(raw, dict) and 'requirements' in raw:
+        raw = raw['requirements']
+    if not isinstance(raw, list):
+        return []
+    return [(i, d) for i, d in enumerate(raw, 1) if isinstance(d, dict)]
+
+
+class Catalogue:
+    """PUID-indexed requirements with lazy access to the full records."""
+
+    def __init__(self, requirements: List[Dict[str, str]], db: Optional[sqlite3.Connection] = None,
+                 records: Optional[Dict[str, Dict[str, Any]]] = None, source_hash: str = ''):
+        self._requirements = requirements
+        self._db = db
+        self._records = records
+        self._lock = threading.Lock()
+        self.source_hash = source_hash
+
+    def __len__(self) -> int:
+        return len(self._requirements)
+
+    def requirements(self) -> List[Dict[str, str]]:
+        """Normalized requirements in catalogue order (a fresh list of fresh dicts)."""
+        return [dict(r) for r in self._requirements]
+
+    def puids(self) -> List[str]:
+        return [r['id'] for r in self._requirements]
+
+    def record(self, puid: str) -> Optional[Dict[str, Any]]:
+        """The full original record of a requirement, loaded on demand."""
+        if self._records is not None:
+            return self._records.get(puid)
+        with self._lock:
+            row = self._db.execute('SELECT record FROM records WHERE puid = ?', (puid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def field(self, puid: str, name: str, default: Any = None) -> Any:
+        rec = self.record(puid)
+        return rec.get(name, default) if rec else default
+
+
+def _compile(db: sqlite3.Connection, records: List[Tuple[int, Dict[str, Any]]], source_hash: str) -> None:
+    db.executescript('''
+        DROP TABLE IF EXISTS meta;
+        DROP TABLE IF EXISTS requirements;
+        DROP TABLE IF EXISTS records;
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE requirements (seq INTEGER PRIMARY KEY, puid TEXT NOT NULL, text TEXT NOT NULL);
+        CREATE TABLE records (puid TEXT PRIMARY KEY, record TEXT NOT NULL);
+    ''')
+    rows, recs = [], {}
+    for i, rec in records:
+        req = normalize_requirement(rec, i)
+        rows.append((i, req['id'], req['text']))
+        recs.setdefault(req['id'], json.dumps(rec, ensure_ascii=False))
+    db.executemany('INSERT INTO requirements VALUES (?, ?, ?)', rows)
+    db.executemany('INSERT INTO records VALUES (?, ?)', recs.items())
+    db.executemany('INSERT INTO meta VALUES (?, ?)',
+                   [('source_hash', source_hash), ('schema', SCHEMA_VERSION)])
+    db.commit()
+
+
+def load_catalogue(path: Union[str, Path], cache_path: Union[str, Path, None] = DEFAULT_CACHE) -> Catalogue:
+    """Load the catalogue at `path`, compiling it into `cache_path` when stale.
+
+    Pass `cache_path=None` to skip the cache and parse the JSON directly.
+    A missing or unreadable catalogue yields an empty `Catalogue`.
+    """
+    try:
+        source = Path(path).read_bytes()
+    except OSError:
+        return Catalogue([])
+    source_hash = hashlib.sha256(source).hexdigest()
+
+    if cache_path:
+        try:
+            Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(cache_path), check_same_thread=False)
+            try:
+                meta = dict(db.execute('SELECT key, value FROM meta'))
+            except sqlite3.DatabaseError:
+                meta = {}
+            if meta.get('source_hash') != source_hash or meta.get('schema') != SCHEMA_VERSION:
+                _compile(db, _records(_parse(source)), source_hash)
+            reqs = [{'id': p, 'text': t}
+                    for p, t in db.execute('SELECT puid, text FROM requirements ORDER BY seq')]
+            return Catalogue(reqs, db=db, source_hash=source_hash)
+        except (OSError, sqlite3.Error):
+            pass  # read-only or corrupt cache: fall back to an in-memory catalogue
+
+    records = _records(_parse(source))
+    reqs = [normalize_requirement(r, i) for i, r in records]
+    by_puid: Dict[str, Dict[str, Any]] = {}
+    for req, (_, rec) in zip(reqs, records):
+        by_puid.setdefault(req['id'], rec)
+    return Catalogue(reqs, records=by_puid, source_hash=source_hash)
+
+
+def _parse(source: bytes) -> Any:
+    try:
+        return json.loads(source.decode('utf-8', errors='ignore'))
+    except ValueError:
+        return None
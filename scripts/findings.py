@@ -0,0 +1,283 @@
+"""
+Normalized security findings shared by the audit scripts.
+
+Trivy, MobSF, SARIF (CodeQL, Semgrep, Detekt, ...) and generic SAST JSON
+reports describe the same kind of problem with different field names,
+severity scales and path conventions, and the same issue is often reported by
+several tools or repeated across SARIF runs.  The `from_*` constructors map a
+raw record of each tool into one compact `Finding` and `FindingSet` removes
+duplicates in a single hash-based pass.
+
+A finding's fingerprint is tool-agnostic: it hashes the canonical rule (CVE or
+GHSA id, else CWE, else the lower-cased rule id), the normalized location, the
+package and the normalized severity.  Duplicates are merged into the first
+record seen, which keeps a count and the list of tools that reported it.
+"""
+
+import hashlib
+import posixpath
+import re
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Severity scale used by every normalized finding.
+SEVERITIES = ('critical', 'high', 'medium', 'low', 'info', 'unknown')
+
+SEVERITY_MAP = {
+    'critical': 'critical', 'high': 'high', 'error': 'high', 'dangerous': 'high',
+    'medium': 'medium', 'moderate': 'medium', 'warning': 'medium',
+    'low': 'low', 'note': 'low',
+    'info': 'info', 'informational': 'info', 'none': 'info', 'secure': 'info', 'good': 'info', 'hotspot': 'info',
+}
+
+_ADVISORY_RX = re.compile(r'\b(CVE-\d{4}-\d{4,}|GHSA(?:-[0-9a-z]{4}){3})\b', re.IGNORECASE)
+_CWE_RX = re.compile(r'\bcwe[-_/ :]?0*(\d{1,5})\b', re.IGNORECASE)
+
+TITLE_CHARS = 300
+
+# Keys inside MobSF sections that hold large blobs rather than issues.
+MOBSF_SKIP_KEYS = frozenset({'certificate_info', 'strings', 'files_list', 'urls', 'emails'})
+
+
+def normalize_severity(value: Any) -> str:
+    """Map a tool-specific severity or SARIF level onto `SEVERITIES`."""
+    return SEVERITY_MAP.get(str(value or '').strip().lower(), 'unknown')
+
+
+def find_cwe(*values: Any) -> str:
+    """Return the first ``CWE-n`` identifier found in the given values (strings or lists)."""
+    for value in values:
+        items = value if isinstance(value, (list, tuple)) else [value]
+        for item in items:
+            m = _CWE_RX.search(str(item or ''))
+            if m:
+                return f'CWE-{int(m.group(1))}'
+    return ''
+
+
+def canonical_rule(rule: Any, cwe: str = '') -> str:
+    """Tool-agnostic rule key: advisory id, else CWE, else the lower-cased rule id."""
+    m = _ADVISORY_RX.search(str(rule or ''))
+    if m:
+        return m.group(1).upper()
+    return cwe or str(rule or '').strip().lower()
+
+
+def canonical_location(uri: Any, line: Any = None) -> str:
+    """Normalize a report path (``file://`` URIs, backslashes, ``./``) and append the line."""
+    path = str(uri or '').strip()
+    if path.startswith('file://'):
+        path = path[len('file://'):]
+    path = path.replace('\\', '/')
+    if path:
+        path = posixpath.normpath(path)
+        path = '' if path == '.' else path
+    if path and line not in (None, '', 0):
+        return f'{path}:{line}'
+    return path
+
+
+class Finding:
+    """One normalized finding; slots keep tens of thousands of them cheap."""
+
+    __slots__ = ('tools', 'rule', 'key', 'cwe', 'severity', 'title', 'location', 'package',
+                 'tags', 'count', 'fingerprint')
+
+    def __init__(self, tool: str, rule: Any, severity: Any, title: Any = '', location: str = '',
+                 package: str = '', cwe: str = '', tags: tuple = ()):
+        self.tools = [tool]
+        self.rule = str(rule or '')
+        self.cwe = cwe
+        self.key = canonical_rule(self.rule, cwe)
+        self.severity = normalize_severity(severity)
+        self.title = str(title or '')[:TITLE_CHARS]
+        self.location = location
+        self.package = str(package or '')
+        self.tags = tags
+        self.count = 1
+        raw = '\x1f'.join((self.key, self.location, self.package, self.severity))
+        self.fingerprint = hashlib.blake2b(raw.encode('utf-8', 'ignore'), digest_size=8).hexdigest()
+
+    @property
+    def source(self) -> str:
+        return '+'.join(self.tools)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Compact dict view with empty fields omitted (used for prompts and JSON outputs)."""
+        out: Dict[str, Any] = {'source': self.source, 'rule': self.rule, 'severity': self.severity}
+        if self.key.lower() not in (self.rule.lower(), self.cwe.lower()):
+            out['key'] = self.key
+        for name in ('cwe', 'title', 'location', 'package'):
+            value = getattr(self, name)
+            if value:
+                out[name] = value
+        if self.count > 1:
+            out['count'] = self.count
+        if self.tags:
+            out['tags'] = list(self.tags)
+        return out
+
+    def __repr__(self) -> str:
+        return f'Finding({self.source}, {self.key}, {self.severity}, {self.location!r})'
+
+
+def from_trivy(vuln: Dict[str, Any], target: str = '', tool: str = 'trivy') -> Finding:
+    """Finding from a Trivy ``Results[].Vulnerabilities[]`` entry (or its compact form)."""
+    vid = vuln.get('VulnerabilityID') or vuln.get('id') or ''
+    return Finding(tool, vid, vuln.get('Severity') or vuln.get('severity'),
+                   vuln.get('Title') or vuln.get('title') or '',
+                   canonical_location(target or vuln.get('target')),
+                   vuln.get('PkgName') or vuln.get('package') or '',
+                   find_cwe(vuln.get('CweIDs')), tags=('dependency',))
+
+
+def from_dependency(vuln: Dict[str, Any], tool: str = 'dependency') -> Finding:
+    """Finding from a generic dependency-scanner ``vulnerabilities[]`` entry."""
+    vid = (vuln.get('id') or vuln.get('VulnerabilityID') or vuln.get('cve') or vuln.get('name') or '')
+    pkg = vuln.get('package') or vuln.get('packageName') or vuln.get('PkgName') or ''
+    if isinstance(pkg, dict):
+        pkg = pkg.get('name') or ''
+    return Finding(tool, vid, vuln.get('severity') or vuln.get('Severity'),
+                   vuln.get('title') or vuln.get('description') or '', '', pkg,
+                   find_cwe(vuln.get('cwe'), vuln.get('cwes')), tags=('dependency',))
+
+
+def from_sarif(result: Dict[str, Any], tool: str = 'sarif-tool') -> Finding:
+    """Finding from a SARIF ``runs[].results[]`` entry."""
+    props = result.get('properties') or {}
+    level = result.get('level') or props.get('severity') or 'warning'
+    rule = result.get('ruleId') or (result.get('rule') or {}).get('id') or ''
+    msg = (result.get('message') or {}).get('text') or ''
+    loc = ((result.get('locations') or [{}])[0] or {}).get('physicalLocation') or {}
+    uri = (loc.get('artifactLocation') or {}).get('uri')
+    line = (loc.get('region') or {}).get('startLine')
+    cwe = find_cwe(props.get('tags'), props.get('cwe'), rule)
+    return Finding(tool, rule, level, msg, canonical_location(uri, line), cwe=cwe)
+
+
+def from_sast_json(item: Dict[str, Any], tool: str = 'sast-json') -> Finding:
+    """Finding from a generic SAST JSON list entry."""
+    rule = item.get('ruleId') or item.get('rule') or ''
+    location = canonical_location(item.get('path') or item.get('file'), item.get('line'))
+    return Finding(tool, rule, item.get('severity'), item.get('message') or '', location,
+                   cwe=find_cwe(item.get('cwe'), rule))
+
+
+def mobsf_location(obj: Dict[str, Any]) -> str:
+    """File or component a MobSF issue refers to, as a canonical location ('' when it has none).
+
+    Issues name it in `file`, `path`, `component` or an already normalized
+    `location`; code-analysis rules list the affected files in a ``files``
+    dict (``{path: "line,line,..."}``), of which the first file and line are used.
+    """
+    for key in ('location', 'file', 'path', 'component'):
+        if isinstance(obj.get(key), str) and obj[key]:
+            return canonical_location(obj[key], obj.get('line'))
+    files = obj.get('files')
+    if isinstance(files, dict) and files:
+        path, lines = next(iter(files.items()))
+        return canonical_location(path, str(lines or '').split(',')[0].strip())
+    return ''
+
+
+def mobsf_meta(item: Dict[str, Any]) -> Dict[str, Any]:
+    """The object carrying a MobSF issue's severity and title: the item or its ``metadata``."""
+    if not (item.get('severity') or item.get('Severity')) and isinstance(item.get('metadata'), dict):
+        return item['metadata']
+    return item
+
+
+def is_mobsf_issue(obj: Dict[str, Any]) -> bool:
+    """True for a MobSF issue object.
+
+    Two shapes are recognised: objects with their own title and severity
+    (manifest, network and binary analysis, dynamic report) and code-analysis
+    rules whose `metadata` carries the severity and description.
+    """
+    meta = mobsf_meta(obj)
+    title = meta.get('title') or meta.get('description') or meta.get('name')
+    return bool(meta.get('severity') or meta.get('Severity') or meta.get('level')) and isinstance(title, str)
+
+
+def iter_mobsf_issues(section: Any, key: str = '') -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield ``(key, issue)`` for every MobSF issue inside one report section.
+
+    The section is walked with an explicit stack, so arbitrarily deep reports
+    cannot overflow the interpreter stack; issues are not descended into and
+    `MOBSF_SKIP_KEYS` subtrees are not entered.  `key` is the dict key the
+    issue was found under (list items inherit their parent's).  Consumers
+    bound the walk by stopping the iteration.
+    """
+    stack = [(key, section)]
+    while stack:
+        key, obj = stack.pop()
+        if isinstance(obj, dict):
+            if is_mobsf_issue(obj):
+                yield key, obj
+                continue
+            stack.extend((k, v) for k, v in reversed(list(obj.items()))
+                         if k not in MOBSF_SKIP_KEYS and isinstance(v, (dict, list)))
+        elif isinstance(obj, list):
+            stack.extend((key, v) for v in reversed(obj) if isinstance(v, (dict, list)))
+
+
+def from_mobsf(item: Dict[str, Any], kind: str = 'static', key: str = '') -> Finding:
+    """Finding from a MobSF issue object (the object or its ``metadata`` carries the severity).
+
+    The rule falls back to the title; `key` (the enclosing section or dict
+    key) is only used when the issue has neither, since many distinct issues
+    share one section.
+    """
+    meta = mobsf_meta(item)
+    title = meta.get('title') or meta.get('description') or meta.get('name') or ''
+    rule = meta.get('rule') or title or key
+    location = mobsf_location(item) or (mobsf_location(meta) if meta is not item else '')
+    return Finding(f'mobsf-{kind}', rule, meta.get('severity') or meta.get('Severity') or meta.get('level'),
+                   title, location, cwe=find_cwe(meta.get('cwe')))
+
+
+class FindingSet:
+    """Insertion-ordered set of findings keyed by fingerprint.
+
+    `add` returns True for a new finding and merges a duplicate into the
+    first occurrence (count and reporting tools) otherwise.
+    """
+
+    def __init__(self):
+        self._by_fp: Dict[str, Finding] = {}
+        self.seen = 0
+        self.by_tool: Counter = Counter()
+
+    def add(self, finding: Finding) -> bool:
+        self.seen += 1
+        tool = finding.tools[0]
+        self.by_tool[tool] += 1
+        first = self._by_fp.get(finding.fingerprint)
+        if first is None:
+            self._by_fp[finding.fingerprint] = finding
+            return True
+        first.count += 1
+        if tool not in first.tools:
+            first.tools.append(tool)
+        return False
+
+    def __len__(self) -> int:
+        return len(self._by_fp)
+
+    def __iter__(self) -> Iterator[Finding]:
+        return iter(self._by_fp.values())
+
+    def get(self, fingerprint: str) -> Optional[Finding]:
+        return self._by_fp.get(fingerprint)
+
+    def as_dicts(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        out = []
+        for f in self._by_fp.values():
+            if limit is not None and len(out) >= limit:
+                break
+            out.append(f.as_dict())
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {'seen': self.seen, 'unique': len(self._by_fp), 'duplicates': self.seen - len(self._by_fp),
+                'by_tool': dict(self.by_tool)}
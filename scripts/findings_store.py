@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Cross-run history of audit verdicts and normalized findings.
+
+Every run of `ai_correlate.py` or `recolectar_datos.py` can append its
+results to one SQLite file (`.ai-cache/history.sqlite` by default, restored
+between CI runs with the rest of the cache).  Three tables are kept:
+
+- ``runs``: one row per run (app, producing script, CI build and commit, time);
+- ``verdicts``: one row per requirement and run (PUID, status, severity);
+- ``findings``: one row per deduplicated finding and run (fingerprint,
+  canonical rule, tool, severity, location, package, count).
+
+Rows are narrow and indexed by run, app, PUID, canonical rule and
+fingerprint, so the history can be sliced per app or per requirement without
+reading the JSON outputs again.  Running this module as a script queries the
+store with pandas (installed by the AI workflow), e.g.::
+
+    python scripts/findings_store.py severity --app openMRS
+    python scripts/findings_store.py time-to-fix --key-prefix CVE-
+    python scripts/findings_store.py flips --min-flips 2
+    python scripts/findings_store.py export --parquet history/   # needs pyarrow
+
+Writing never needs pandas; only the query commands do.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Union
+
+DEFAULT_STORE = os.path.join('.ai-cache', 'history.sqlite')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    app TEXT NOT NULL,
+    source TEXT NOT NULL,
+    build TEXT NOT NULL DEFAULT '',
+    commit_sha TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT '',
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS verdicts (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    puid TEXT NOT NULL,
+    status TEXT NOT NULL,
+    severity TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS findings (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    fingerprint TEXT NOT NULL,
+    key TEXT NOT NULL,
+    tool TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    location TEXT NOT NULL DEFAULT '',
+    package TEXT NOT NULL DEFAULT '',
+    count INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS runs_app ON runs(app, started);
+CREATE INDEX IF NOT EXISTS verdicts_run ON verdicts(run_id);
+CREATE INDEX IF NOT EXISTS verdicts_puid ON verdicts(puid, run_id);
+CREATE INDEX IF NOT EXISTS findings_run ON findings(run_id);
+CREATE INDEX IF NOT EXISTS findings_key ON findings(key, run_id);
+CREATE INDEX IF NOT EXISTS findings_fp ON findings(fingerprint, run_id);
+'''
+
+
+class FindingsStore:
+    """Append-only SQLite history of runs, verdicts and findings."""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_STORE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path), timeout=30)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+
+    def start_run(self, app: str, source: str, model: str = '') -> int:
+        """Register a run; build and commit are taken from the GitHub Actions environment."""
+        build = os.getenv('GITHUB_RUN_ID', '')
+        if build and os.getenv('GITHUB_RUN_ATTEMPT'):
+            build += '.' + os.environ['GITHUB_RUN_ATTEMPT']
+        cur = self.db.execute(
+            'INSERT INTO runs (app, source, build, commit_sha, model, started) VALUES (?, ?, ?, ?, ?, ?)',
+            (app, source, build, os.getenv('GITHUB_SHA', ''), model, time.time()))
+        self.db.commit()
+        return cur.lastrowid
+
+    def add_verdicts(self, run_id: int, verdicts: Iterable[Dict[str, Any]]) -> int:
+        """Append ``{puid, status, severity}`` records; returns the number of rows."""
+        rows = ((run_id, str(v.get('puid') or v.get('id') or ''), str(v.get('status') or ''),
+                 str(v.get('severity') or '')) for v in verdicts)
+        return self._insert('INSERT INTO verdicts VALUES (?, ?, ?, ?)', rows)
+
+    def add_findings(self, run_id: int, findings: Iterable[Any]) -> int:
+        """Append normalized `findings.Finding` records; returns the number of rows."""
+        rows = ((run_id, f.fingerprint, f.key, f.source, f.severity, f.location, f.package, f.count)
+                for f in findings)
+        return self._insert('INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def _insert(self, sql: str, rows: Iterable[tuple]) -> int:
+        before = self.db.total_changes
+        with self.db:
+            self.db.executemany(sql, rows)
+        return self.db.total_changes - before
+
+    def close(self) -> None:
+        self.db.close()
+
+
+# --- Queries (pandas) ---
+
+def _frames(db: sqlite3.Connection, table: str, app: Optional[str], last: int):
+    import pandas as pd
+    runs = pd.read_sql_query('SELECT * FROM runs' + (' WHERE app = ?' if app else '') + ' ORDER BY started',
+                             db, params=(app,) if app else None)
+    if last > 0:
+        runs = runs.groupby('app', group_keys=False).tail(last)
+    if table == 'runs':
+        return runs, None
+    ids = ','.join(str(int(i)) for i in runs['run_id']) or 'NULL'
+    rows = pd.read_sql_query(f'SELECT * FROM {table} WHERE run_id IN ({ids})', db)
+    rows = rows.merge(runs[['run_id', 'app', 'source', 'build', 'started']], on='run_id')
+    rows['date'] = pd.to_datetime(rows['started'], unit='s').dt.strftime('%Y-%m-%d %H:%M')
+    return runs, rows
+
+
+def query_severity(db: sqlite3.Connection, app: Optional[str] = None, last: int = 0):
+    """Distinct findings per run and normalized severity."""
+    _, rows = _frames(db, 'findings', app, last)
+    return rows.pivot_table(index=['app', 'run_id', 'date', 'build'], columns='severity',
+                            values='fingerprint', aggfunc='count', fill_value=0)
+
+
+def query_status(db: sqlite3.Connection, app: Optional[str] = None, last: int = 0):
+    """Requirement verdicts per run and status."""
+    _, rows = _frames(db, 'verdicts', app, last)
+    return rows.pivot_table(index=['app', 'run_id', 'date', 'source'], columns='status',
+                            values='puid', aggfunc='count', fill_value=0)
+
+
+def query_time_to_fix(db: sqlite3.Connection, app: Optional[str] = None, last: int = 0,
+                      key_prefix: str = 'CVE-'):
+    """First/last run in which each rule key was seen and when it disappeared.
+
+    A key counts as fixed at the first later run of the same app and
+    producing script that no longer reports it; ``days_to_fix`` is measured
+    from its first sighting.  Keys still present in the latest run are open.
+    """
+    import pandas as pd
+    runs, rows = _frames(db, 'findings', app, last)
+    rows = rows[rows['key'].str.startswith(key_prefix)] if key_prefix else rows
+    seen = (rows.groupby(['app', 'source', 'key'])
+            .agg(first_seen=('started', 'min'), last_seen=('started', 'max'), runs=('run_id', 'nunique'),
+                 severity=('severity', 'first'))
+            .reset_index())
+    timeline = runs[['app', 'source', 'started']].sort_values('started')
+    nxt = pd.merge_asof(seen.sort_values('last_seen'), timeline.rename(columns={'started': 'fixed_at'}),
+                        left_on='last_seen', right_on='fixed_at', by=['app', 'source'],
+                        direction='forward', allow_exact_matches=False)
+    nxt['days_to_fix'] = ((nxt['fixed_at'] - nxt['first_seen']) / 86400).round(2)
+    nxt['status'] = nxt['fixed_at'].notna().map({True: 'fixed', False: 'open'})
+    for col in ('first_seen', 'last_seen', 'fixed_at'):
+        nxt[col] = pd.to_datetime(nxt[col], unit='s').dt.strftime('%Y-%m-%d')
+    return nxt.sort_values(['status', 'days_to_fix'], ascending=[True, False]).set_index(['app', 'key'])
+
+
+def query_flips(db: sqlite3.Connection, app: Optional[str] = None, last: int = 0, min_flips: int = 1):
+    """Requirements whose status changed between consecutive runs."""
+    _, rows = _frames(db, 'verdicts', app, last)
+    rows = rows.sort_values(['app', 'source', 'puid', 'started'])
+    prev = rows.groupby(['app', 'source', 'puid'])['status'].shift()
+    rows['flip'] = prev.notna() & (prev != rows['status'])
+    out = (rows.groupby(['app', 'source', 'puid'])
+           .agg(flips=('flip', 'sum'), runs=('run_id', 'nunique'), last_status=('status', 'last'),
+                statuses=('status', lambda s: '>'.join(s.tolist()[-8:])))
+           .reset_index())
+    out = out[out['flips'] >= min_flips]
+    return out.sort_values(['flips', 'puid'], ascending=[False, True]).set_index(['app', 'source', 'puid'])
+
+
+def export_parquet(db: sqlite3.Connection, outdir: Union[str, Path]) -> None:
+    """Write each table as a Parquet dataset partitioned by app (requires pyarrow)."""
+    import pandas as pd
+    runs = pd.read_sql_query('SELECT * FROM runs', db)
+    runs.to_parquet(Path(outdir) / 'runs', partition_cols=['app'], index=False)
+    for table in ('verdicts', 'findings'):
+        rows = pd.read_sql_query(f'SELECT * FROM {table}', db).merge(runs[['run_id', 'app']], on='run_id')
+        rows.to_parquet(Path(outdir) / table, partition_cols=['app'], index=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Query the cross-run audit history')
+    parser.add_argument('--store', default=os.environ.get('AI_HISTORY', DEFAULT_STORE))
+    parser.add_argument('--app', help='Restrict to one application')
+    parser.add_argument('--last', type=int, default=0, help='Only the last N runs per app (0 = all)')
+    parser.add_argument('--format', choices=('table', 'csv', 'json'), default='table')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('runs', help='List the recorded runs')
+    sub.add_parser('severity', help='Finding counts per run and severity')
+    sub.add_parser('status', help='Verdict counts per run and status')
+    ttf = sub.add_parser('time-to-fix', help='Time until each finding key stopped being reported')
+    ttf.add_argument('--key-prefix', default='CVE-', help="Only keys with this prefix ('' = all)")
+    flips = sub.add_parser('flips', help='Requirements whose status keeps changing')
+    flips.add_argument('--min-flips', type=int, default=1)
+    export = sub.add_parser('export', help='Export the store to partitioned Parquet')
+    export.add_argument('--parquet', required=True, help='Output directory')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.store):
+        sys.exit(f'No history store at {args.store}')
+    try:
+        import pandas as pd
+    except ImportError:
+        sys.exit('The query commands require pandas (pip install pandas)')
+    db = sqlite3.connect(f'file:{args.store}?mode=ro', uri=True)
+    if args.command == 'export':
+        export_parquet(db, args.parquet)
+        return
+    if args.command == 'runs':
+        df = _frames(db, 'runs', args.app, args.last)[0].set_index('run_id')
+        df['started'] = pd.to_datetime(df['started'], unit='s').dt.strftime('%Y-%m-%d %H:%M')
+    elif args.command == 'severity':
+        df = query_severity(db, args.app, args.last)
+    elif args.command == 'status':
+        df = query_status(db, args.app, args.last)
+    elif args.command == 'time-to-fix':
+        df = query_time_to_fix(db, args.app, args.last, args.key_prefix)
+    else:
+        df = query_flips(db, args.app, args.last, args.min_flips)
+
+    if args.format == 'csv':
+        print(df.to_csv())
+    elif args.format == 'json':
+        print(df.reset_index().to_json(orient='records', indent=2))
+    else:
+        print(df.to_string() if len(df) else '(no rows)')
+
+
+if __name__ == '__main__':
+    main()
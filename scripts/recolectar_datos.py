@@ -13,18 +13,58 @@ If a `requirements/compliance_status.json` file is present, the boolean
 values from that file will be used; otherwise all requirements default to
 compliant (`True`).  Optionally, this script will parse Trivy results from
 `trivy_results.json` and dependency vulnerability results from
-`dependency_results.json` to populate the vulnerability lists.
+`dependency_results.json` to populate the vulnerability lists.  With
+`--reports DIR_OR_ZIP` the reports are located in a directory of artifacts or
+read directly from `.zip` artifacts instead, without extracting them.
+Vulnerability entries are normalized with the shared `findings` module and
+duplicates (same fingerprint) are dropped from each list.
+
+With `--compact` the file is written without indentation and gains, for each
+vulnerability list (`container_scan`, `dependency`, `mobsf`), a severity
+histogram in `vulnerability_summary` and an id -> severity map in
+`vulnerability_index`, so threshold and membership rules do not have to
+iterate the lists.  `--data-dir DIR` additionally moves the lists and their
+indexes out of `input.json` into separate OPA data documents
+(`DIR/vulnerabilities/<name>/data.json`, loaded with `opa eval -d DIR` as
+`data.vulnerabilities.<name>.items` and `.by_id`), leaving only the
+summaries in the input.
 """
 
+import argparse
 import json
 import os
-from typing import Dict, List, Any
+import sys
+from typing import Dict, List, Any, Optional, Tuple
+
+from catalogue import load_catalogue
+from findings import (SEVERITIES, from_dependency, from_mobsf, from_trivy, iter_mobsf_issues, mobsf_location,
+                      mobsf_meta, normalize_severity)
+from findings_store import FindingsStore
+from reports_io import (MOBSF_SKIP_SECTIONS, ReportIndex, ReportRef, iter_items, iter_sections,
+                        report_exists)
+
+# Upper bound on the entries kept from each vulnerability report.  Reports are
+# streamed, so the cap also bounds memory on very large scan outputs.
+MAX_VULNERABILITIES = 100_000
+MAX_MOBSF_VULNERABILITIES = 10_000
+
+# input.json key of each vulnerability list -> name used by the compact output.
+VULNERABILITY_LISTS = {
+    'container_scan_vulnerabilities': 'container_scan',
+    'dependency_vulnerabilities': 'dependency',
+    'mobsf_vulnerabilities': 'mobsf',
+}
 
 
 def load_requirements(path: str) -> List[Dict[str, Any]]:
-    """Load the requirements catalogue from a JSON file."""
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """Load the normalized requirements (`id`, `text`) from the catalogue.
+
+    The JSON catalogue is compiled once into a cached, PUID-indexed file
+    (see `catalogue.load_catalogue`) shared with ai_correlate.py.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return load_catalogue(path).requirements()
 
 
 def load_compliance_mapping(path: str) -> Dict[str, bool]:
@@ -40,104 +80,218 @@ def load_compliance_mapping(path: str) -> Dict[str, bool]:
     return {}
 
 
-def parse_trivy_results(path: str) -> List[Dict[str, Any]]:
+def parse_trivy_results(path: ReportRef, limit: Optional[int] = MAX_VULNERABILITIES) -> List[Dict[str, Any]]:
     """Parse a Trivy JSON results file into a list of vulnerability entries.
 
     Each entry is a dict with at least `id` and `severity` keys.  This
-    function is resilient to changes in the Trivy output format.
+    function is resilient to changes in the Trivy output format.  The
+    `Results[].Vulnerabilities[]` objects are streamed and at most `limit`
+    entries are returned.  The same vulnerability reported twice for one
+    target and package is kept once.
     """
     vulnerabilities: List[Dict[str, Any]] = []
-    if os.path.exists(path):
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            # Trivy results JSON has a `Results` array with objects containing
-            # `Vulnerabilities` arrays.
-            for result in data.get('Results', []):
-                for vuln in result.get('Vulnerabilities', []) or []:
-                    vulnerabilities.append({
-                        'id': vuln.get('VulnerabilityID'),
-                        'severity': vuln.get('Severity')
-                    })
-        except Exception:
-            # If parsing fails, return empty list
-            pass
+    seen = set()
+    if report_exists(path):
+        # Trivy results JSON has a `Results` array with objects containing
+        # `Vulnerabilities` arrays.
+        items = iter_items(path, 'Results.item.Vulnerabilities.item', {'target': 'Results.item.Target'})
+        for ctx, vuln in items:
+            if limit is not None and len(vulnerabilities) >= limit:
+                break
+            if isinstance(vuln, dict):
+                fp = from_trivy(vuln, ctx.get('target', '')).fingerprint
+                if fp in seen:
+                    continue
+                seen.add(fp)
+                vulnerabilities.append({
+                    'id': vuln.get('VulnerabilityID'),
+                    'severity': vuln.get('Severity')
+                })
     return vulnerabilities
 
 
-def parse_dependency_results(path: str) -> List[Dict[str, Any]]:
+def parse_dependency_results(path: ReportRef, limit: Optional[int] = MAX_VULNERABILITIES) -> List[Dict[str, Any]]:
     """Parse dependency vulnerability results into a list.
 
     The expected format is a JSON object with a `vulnerabilities` field that
     contains a list of objects describing package vulnerabilities.  If the
-    structure differs, this function returns an empty list.
+    structure differs, this function returns an empty list.  At most `limit`
+    distinct entries are streamed from the file.
     """
-    if os.path.exists(path):
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            vulns = data.get('vulnerabilities', [])
-            if isinstance(vulns, list):
-                return vulns
-        except Exception:
-            pass
-    return []
+    vulnerabilities: List[Dict[str, Any]] = []
+    seen = set()
+    if report_exists(path):
+        for _, vuln in iter_items(path, 'vulnerabilities.item'):
+            if limit is not None and len(vulnerabilities) >= limit:
+                break
+            if isinstance(vuln, dict):
+                fp = from_dependency(vuln).fingerprint
+                if fp in seen:
+                    continue
+                seen.add(fp)
+            vulnerabilities.append(vuln)
+    return vulnerabilities
+
+
+def _mobsf_entry(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the ``{title, severity[, location]}`` view of a MobSF issue (see `findings.is_mobsf_issue`)."""
+    meta = mobsf_meta(obj)
+    entry = {'title': meta.get('title') or meta.get('description') or meta.get('name'),
+             'severity': meta.get('severity') or meta.get('Severity') or meta.get('level')}
+    location = mobsf_location(obj) or (mobsf_location(meta) if meta is not obj else '')
+    if location:
+        entry['location'] = location
+    return entry
 
 
-def parse_mobsf_results(path: str) -> List[Dict[str, Any]]:
+def parse_mobsf_results(path: ReportRef, limit: Optional[int] = MAX_MOBSF_VULNERABILITIES) -> List[Dict[str, Any]]:
     """Parse a MobSF JSON report into a list of vulnerability entries.
 
     The MobSF report structure can vary depending on the scan configuration,
-    but typically it contains nested dictionaries and lists with findings that
-    include `title` and `severity` fields.  This function traverses the
-    report recursively, extracting any objects that contain those keys.
+    but findings are objects that carry a `title` and a `severity` (or a
+    code-analysis rule whose `metadata` does).  The report is streamed one
+    top-level section at a time, skipping the heavy sections that never hold
+    findings (`reports_io.MOBSF_SKIP_SECTIONS`: strings, file and URL
+    listings, ...), and each section is walked with an explicit stack
+    (`findings.iter_mobsf_issues`, shared with ai_correlate.py), so
+    arbitrarily deep reports cannot overflow the interpreter stack.  The
+    same finding reported under several sections is kept once, keyed by
+    (title, severity, location).
 
     Args:
-        path: Path to the MobSF JSON report file.
+        path: Path to the MobSF JSON report file (or a member of a .zip artifact).
+        limit: Maximum number of entries to return (None for no limit).
 
     Returns:
-        A list of dictionaries with at least `title` and `severity` keys.
+        A list of dictionaries with `title` and `severity` keys, plus
+        `location` when the finding names a file or component.  A report that
+        cannot be parsed completely is reported on stderr and the entries
+        read up to that point are returned.
     """
     vulnerabilities: List[Dict[str, Any]] = []
-    if os.path.exists(path):
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+    seen = set()
+    if not report_exists(path):
+        return vulnerabilities
 
-            def extract_items(obj: Any) -> None:
-                if isinstance(obj, dict):
-                    # If the object has both title and severity, record it as a vulnerability
-                    if 'title' in obj and 'severity' in obj:
-                        vulnerabilities.append({'title': obj['title'], 'severity': obj['severity']})
-                    # Recurse into dictionary values
-                    for v in obj.values():
-                        extract_items(v)
-                elif isinstance(obj, list):
-                    for item in obj:
-                        extract_items(item)
-
-            extract_items(data)
-        except Exception:
-            # Parsing failure results in an empty list
-            pass
+    def full() -> bool:
+        return limit is not None and len(vulnerabilities) >= limit
+
+    try:
+        for _, section in iter_sections(path, skip=MOBSF_SKIP_SECTIONS, strict=True):
+            for _, obj in iter_mobsf_issues(section):
+                entry = _mobsf_entry(obj)
+                ident = (str(entry['title']), str(entry['severity']).lower(), entry.get('location', ''))
+                if ident not in seen:
+                    seen.add(ident)
+                    vulnerabilities.append(entry)
+                if full():
+                    break
+            if full():
+                break
+    except ValueError as e:
+        print(f'[WARN] MobSF report only partially parsed ({len(vulnerabilities)} entries): {e}',
+              file=sys.stderr)
     return vulnerabilities
 
 
+def vulnerability_id(vuln: Dict[str, Any]) -> str:
+    """Identifier of a vulnerability entry: CVE/advisory id, else package name, else MobSF title."""
+    for key in ('id', 'VulnerabilityID', 'cve', 'name', 'title'):
+        if vuln.get(key):
+            return str(vuln[key])
+    return ''
+
+
+def summarize_vulnerabilities(vulns: List[Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Severity histogram and id -> severity index of a vulnerability list.
+
+    Severities are normalized onto `findings.SEVERITIES` and every level is
+    present in the histogram (with 0), so policies can compare counts without
+    guarding against undefined keys.  An id reported with several severities
+    keeps the highest one.
+    """
+    rank = {s: i for i, s in enumerate(SEVERITIES)}
+    by_severity = dict.fromkeys(SEVERITIES, 0)
+    by_id: Dict[str, str] = {}
+    for vuln in vulns:
+        if not isinstance(vuln, dict):
+            continue
+        severity = normalize_severity(vuln.get('severity') or vuln.get('Severity'))
+        by_severity[severity] += 1
+        vid = vulnerability_id(vuln)
+        if vid and (vid not in by_id or rank[severity] < rank[by_id[vid]]):
+            by_id[vid] = severity
+    present = [s for s in SEVERITIES if by_severity[s]]
+    summary = {'total': sum(by_severity.values()), 'by_severity': by_severity,
+               'max_severity': present[0] if present else 'none'}
+    return summary, by_id
+
+
+def write_json(path: str, data: Any, compact: bool = False) -> None:
+    """Write `data` as JSON, indented or with the most compact separators."""
+    with open(path, 'w', encoding='utf-8') as f:
+        if compact:
+            json.dump(data, f, separators=(',', ':'), ensure_ascii=False)
+        else:
+            json.dump(data, f, indent=2)
+
+
+def compact_input(data: Dict[str, Any], data_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Add severity summaries and id indexes to the OPA input.
+
+    Without `data_dir` the vulnerability lists stay in the input next to
+    `vulnerability_summary` and `vulnerability_index`.  With it, each list
+    and its index are written to `<data_dir>/vulnerabilities/<name>/data.json`
+    as ``{"by_id": {...}, "items": [...]}`` and removed from the input, whose
+    size then no longer depends on the number of findings.
+    """
+    out = dict(data)
+    summary: Dict[str, Any] = {}
+    index: Dict[str, Dict[str, str]] = {}
+    for key, name in VULNERABILITY_LISTS.items():
+        vulns = out.get(key) or []
+        summary[name], index[name] = summarize_vulnerabilities(vulns)
+        if data_dir:
+            del out[key]
+            doc_dir = os.path.join(data_dir, 'vulnerabilities', name)
+            os.makedirs(doc_dir, exist_ok=True)
+            write_json(os.path.join(doc_dir, 'data.json'), {'by_id': index[name], 'items': vulns}, compact=True)
+    out['vulnerability_summary'] = summary
+    if not data_dir:
+        out['vulnerability_index'] = index
+    return out
+
+
 def main() -> None:
     """Main entry point for the data collection script."""
+    parser = argparse.ArgumentParser(description='Build the OPA input.json')
+    parser.add_argument('--reports', help='Directory of scan artifacts or a .zip artifact to read reports from')
+    parser.add_argument('--history', help='Also append the compliance results and findings to this SQLite history '
+                                          '(see findings_store.py)')
+    parser.add_argument('--compact', action='store_true',
+                        help='Write a compact input.json with per-list severity histograms and id -> severity indexes')
+    parser.add_argument('--data-dir', help='With --compact (implied), move the vulnerability lists and indexes to '
+                                           'OPA data documents under this directory')
+    args = parser.parse_args()
+
     # Paths relative to repository root
     requirements_path = os.path.join('requirements', 'requisitos.json')
     compliance_path = os.path.join('requirements', 'compliance_status.json')
-    trivy_results_path = 'trivy_results.json'
-    dependency_results_path = 'dependency_results.json'
-    mobsf_results_path = 'mobsf_results.json'
+    trivy_results_path: ReportRef = 'trivy_results.json'
+    dependency_results_path: ReportRef = 'dependency_results.json'
+    mobsf_results_path: ReportRef = 'mobsf_results.json'
+    if args.reports:
+        index = ReportIndex(args.reports)
+        trivy_results_path = index.first('trivy') or trivy_results_path
+        dependency_results_path = index.first('dependency') or dependency_results_path
+        mobsf_results_path = index.first('mobsf_static') or mobsf_results_path
 
     requirements = load_requirements(requirements_path)
     compliance_mapping = load_compliance_mapping(compliance_path)
 
     compliance: Dict[str, bool] = {}
     for req in requirements:
-        puid = req.get('PUID')
+        puid = req['id']
         # Default to True (compliant) unless mapping says otherwise
         compliance[puid] = compliance_mapping.get(puid, True)
 
@@ -171,8 +325,30 @@ def main() -> None:
     }
 
     # Write the input file for OPA
-    with open('input.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
+    compact = args.compact or bool(args.data_dir)
+    write_json('input.json', compact_input(data, args.data_dir) if compact else data, compact=compact)
+
+    if args.history:
+        record_history(args.history, compliance, container_vulns, dependency_vulns, mobsf_vulns)
+
+
+def record_history(path: str, compliance: Dict[str, bool], container_vulns: List[Dict[str, Any]],
+                   dependency_vulns: List[Dict[str, Any]], mobsf_vulns: List[Dict[str, Any]]) -> None:
+    """Append this run's compliance verdicts and normalized findings to the history store.
+
+    MobSF entries keep the `location` set by `parse_mobsf_results`, so
+    distinct issues of one rule stay distinct rows (and fingerprints).
+    """
+    app = os.path.basename(os.getenv('GITHUB_REPOSITORY', 'openMRS'))
+    store = FindingsStore(path)
+    run_id = store.start_run(app, 'recolectar_datos')
+    store.add_verdicts(run_id, ({'puid': puid, 'status': 'Yes' if ok else 'No'}
+                                for puid, ok in compliance.items()))
+    findings = [from_trivy(v) for v in container_vulns]
+    findings += [from_dependency(v) for v in dependency_vulns if isinstance(v, dict)]
+    findings += [from_mobsf(v, 'static') for v in mobsf_vulns]
+    store.add_findings(run_id, findings)
+    store.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,356 @@
+"""
+Discovery of scanner reports for the audit scripts.
+
+The `reports/` directory of the AI workflow holds the merged artifacts of
+every job in the run (Trivy, MobSF, CodeQL/Semgrep/Detekt SARIF, generic SAST
+JSON).  `ReportIndex` walks it exactly once, classifies each file by tool and
+kind from its name and, when the name is not conclusive, from a short sniff of
+its first bytes, and exposes typed lookups to the summarizers.
+
+Large reports are read incrementally: `iter_items` yields the objects under a
+path such as ``runs.item.results.item`` one at a time and `iter_sections`
+yields the top-level members of a document, so callers can stop early and
+apply caps without holding the whole document in memory.  Streaming uses
+`ijson` when it is installed; otherwise the document is loaded in full and
+walked with the same semantics.
+
+Artifacts may also arrive as `.zip` files.  Their members are indexed and
+read through `zipfile` streams (`ZipMember`), so nothing is extracted to
+disk; every reader here accepts either a filesystem path or a `ZipMember`.
+"""
+
+import fnmatch
+import json
+import os
+import posixpath
+import re
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import ijson
+    HAVE_IJSON = True
+except ImportError:  # pragma: no cover - depends on the environment
+    ijson = None
+    HAVE_IJSON = False
+
+SNIFF_BYTES = 4096
+
+# Kinds in lookup priority order; name rules are checked top to bottom and the
+# first match wins, so the more specific MobSF dynamic rule precedes static.
+NAME_RULES: List[Tuple[str, List[str]]] = [
+    ('agent_payload', ['agent_payload.json']),
+    ('trivy', ['trivy.json', 'trivy_results.json', '*trivy*.json']),
+    ('dependency', ['dependency_results.json', '*dependency*results*.json']),
+    ('mobsf_dynamic', ['*mobsf*dynamic*.json']),
+    ('mobsf_static', ['*mobsf*static*.json', '*mobsf*results*.json', '*mobsf*report*.json',
+                      '*report_json*.json']),
+    ('sarif', ['*.sarif']),
+    ('sast_json', ['sast*.json', '*codeql*results*.json']),
+]
+KINDS = [k for k, _ in NAME_RULES]
+
+# Top-level MobSF sections that never hold findings but can make up most of
+# a report (extracted strings, file and URL listings, component inventories).
+MOBSF_SKIP_SECTIONS = frozenset({
+    'strings', 'files', 'urls', 'emails', 'domains', 'firebase_urls', 'trackers', 'playstore_details',
+    'apkid', 'libraries', 'activities', 'services', 'receivers', 'providers', 'exported_activities',
+    'browsable_activities', 'icon_path', 'sbom',
+})
+
+SNIFF_RULES: List[Tuple[str, re.Pattern]] = [
+    ('sarif', re.compile(rb'"\$schema"\s*:\s*"[^"]*sarif', re.IGNORECASE)),
+    ('trivy', re.compile(rb'"SchemaVersion"\s*:.*"ArtifactName"', re.DOTALL)),
+    ('mobsf_dynamic', re.compile(rb'"title"\s*:\s*"Dynamic Analysis"', re.IGNORECASE)),
+    ('mobsf_static', re.compile(rb'"title"\s*:\s*"Static Analysis"', re.IGNORECASE)),
+]
+
+
+def classify_name(name: str) -> Optional[str]:
+    """Return the report kind implied by a file name, or None."""
+    low = name.lower()
+    for kind, globs in NAME_RULES:
+        if any(fnmatch.fnmatchcase(low, g) for g in globs):
+            return kind
+    return None
+
+
+def sniff_kind(head: bytes) -> Optional[str]:
+    """Return the report kind implied by the first bytes of a JSON document, or None."""
+    for kind, rx in SNIFF_RULES:
+        if rx.search(head):
+            return kind
+    return None
+
+
+class ZipMember:
+    """A report stored inside a .zip artifact.
+
+    Mirrors the small part of the `Path` API the readers rely on (`name`,
+    `exists`, `read_bytes`, `read_text`) so it can be passed wherever a report
+    path is expected.
+    """
+
+    __slots__ = ('archive', 'member')
+
+    def __init__(self, archive: Union[str, Path], member: str):
+        self.archive = Path(archive)
+        self.member = member
+
+    @property
+    def name(self) -> str:
+        return posixpath.basename(self.member)
+
+    def exists(self) -> bool:
+        return self.archive.is_file()
+
+    def read_bytes(self) -> bytes:
+        with open_report(self) as f:
+            return f.read()
+
+    def read_text(self, encoding: str = 'utf-8', errors: str = 'strict') -> str:
+        return self.read_bytes().decode(encoding, errors)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, ZipMember) and (self.archive, self.member) == (other.archive, other.member)
+
+    def __hash__(self) -> int:
+        return hash((self.archive, self.member))
+
+    def __str__(self) -> str:
+        return f'{self.archive}!/{self.member}'
+
+    __repr__ = __str__
+
+
+ReportRef = Union[str, Path, ZipMember]
+
+
+@contextmanager
+def open_report(ref: ReportRef) -> Iterator[IO[bytes]]:
+    """Open a report path or zip member as a binary stream."""
+    if isinstance(ref, ZipMember):
+        with zipfile.ZipFile(ref.archive) as zf, zf.open(ref.member) as f:
+            yield f
+    else:
+        with open(ref, 'rb') as f:
+            yield f
+
+
+def report_exists(ref: Optional[ReportRef]) -> bool:
+    if not ref:
+        return False
+    return ref.exists() if isinstance(ref, ZipMember) else os.path.exists(ref)
+
+
+def classify_file(path: ReportRef) -> Optional[str]:
+    """Classify a report file by name first and by a header sniff for other JSON files."""
+    name = path.name if isinstance(path, ZipMember) else os.path.basename(path)
+    kind = classify_name(name)
+    if kind or not name.lower().endswith('.json'):
+        return kind
+    try:
+        with open_report(path) as f:
+            return sniff_kind(f.read(SNIFF_BYTES))
+    except (OSError, zipfile.BadZipFile):
+        return None
+
+
+class ReportIndex:
+    """One-pass index of the report files under a directory, grouped by kind.
+
+    `root` may be a directory (any `.zip` found in it is indexed member by
+    member) or a single `.zip` artifact.
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self.by_kind: Dict[str, List[ReportRef]] = {k: [] for k in KINDS}
+        self.files = 0
+        self.archives = 0
+        self._seen: set = set()
+        if self.root.is_file() and self.root.suffix.lower() == '.zip':
+            self._add_archive(self.root)
+            return
+        if not self.root.is_dir():
+            return
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            for fn in sorted(filenames):
+                path = os.path.join(dirpath, fn)
+                if fn.lower().endswith('.zip'):
+                    self._add_archive(Path(path))
+                    continue
+                real = os.path.realpath(path) if os.path.islink(path) else path
+                self._add(Path(path), real)
+
+    def _add(self, ref: ReportRef, key: Any) -> None:
+        self.files += 1
+        kind = classify_file(ref)
+        if not kind or key in self._seen:
+            return
+        self._seen.add(key)
+        self.by_kind[kind].append(ref)
+
+    def _add_archive(self, archive: Path) -> None:
+        try:
+            with zipfile.ZipFile(archive) as zf:
+                members = sorted(i.filename for i in zf.infolist() if not i.is_dir())
+        except (OSError, zipfile.BadZipFile):
+            return
+        self.archives += 1
+        for m in members:
+            self._add(ZipMember(archive, m), (str(archive), m))
+
+    def find(self, *kinds: str) -> List[ReportRef]:
+        """All files of the given kinds, in the order the kinds are listed."""
+        out: List[ReportRef] = []
+        for k in kinds:
+            out.extend(self.by_kind.get(k, []))
+        return out
+
+    def first(self, *kinds: str) -> Optional[ReportRef]:
+        """The first file of the given kinds, or None."""
+        found = self.find(*kinds)
+        return found[0] if found else None
+
+    def counts(self) -> Dict[str, int]:
+        return {k: len(v) for k, v in self.by_kind.items() if v}
+
+
+def load_document(path: ReportRef) -> Any:
+    """Load a whole JSON document, returning None if it is missing or invalid."""
+    try:
+        with open_report(path) as f:
+            return json.loads(f.read().decode('utf-8', errors='ignore'))
+    except (OSError, ValueError, RecursionError, zipfile.BadZipFile):
+        return None
+
+
+def _get(node: Any, parts: List[str]) -> Any:
+    for p in parts:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(p)
+    return node
+
+
+def _walk(node: Any, parts: List[str], prefix: str, context: Dict[str, str],
+          ctx: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], Any]]:
+    # context values rooted at this node (e.g. runs.item -> tool.driver.name)
+    for name, spec in context.items():
+        if prefix and spec.startswith(prefix + '.'):
+            rest = spec[len(prefix) + 1:].split('.')
+            if 'item' not in rest:
+                value = _get(node, rest)
+                if isinstance(value, (str, int, float, bool)):
+                    ctx[name] = value
+    if not parts:
+        yield dict(ctx), node
+        return
+    head, tail = parts[0], parts[1:]
+    sub = f'{prefix}.{head}' if prefix else head
+    if head == 'item':
+        for child in node if isinstance(node, list) else []:
+            yield from _walk(child, tail, sub, context, ctx)
+    elif isinstance(node, dict) and head in node:
+        yield from _walk(node[head], tail, sub, context, ctx)
+
+
+def iter_items(path: ReportRef, item_prefix: str,
+               context: Optional[Dict[str, str]] = None) -> Iterator[Tuple[Dict[str, Any], Any]]:
+    """Yield ``(context, item)`` for every value under an ijson-style prefix.
+
+    `context` maps names to scalar prefixes seen before the items, e.g.
+    ``{'tool': 'runs.item.tool.driver.name'}``; each item is paired with the
+    most recent value of each.  Invalid or truncated documents end the
+    iteration instead of raising.
+    """
+    context = context or {}
+    if not HAVE_IJSON:
+        doc = load_document(path)
+        if doc is not None:
+            yield from _walk(doc, item_prefix.split('.') if item_prefix else [], '', context, {})
+        return
+    by_prefix = {v: k for k, v in context.items()}
+    ctx: Dict[str, Any] = {}
+    try:
+        with open_report(path) as f:
+            builder = None
+            depth = 0
+            for prefix, event, value in ijson.parse(f, use_float=True):
+                if builder is not None:
+                    builder.event(event, value)
+                    if event in ('start_map', 'start_array'):
+                        depth += 1
+                    elif event in ('end_map', 'end_array'):
+                        depth -= 1
+                        if not depth:
+                            yield dict(ctx), builder.value
+                            builder = None
+                    continue
+                if prefix == item_prefix:
+                    if event in ('start_map', 'start_array'):
+                        builder = ijson.ObjectBuilder()
+                        builder.event(event, value)
+                        depth = 1
+                    elif event not in ('end_map', 'end_array', 'map_key'):
+                        yield dict(ctx), value
+                    continue
+                name = by_prefix.get(prefix)
+                if name and event in ('string', 'number', 'boolean'):
+                    ctx[name] = value
+    except (OSError, ValueError, zipfile.BadZipFile, ijson.JSONError, ijson.IncompleteJSONError):
+        return
+
+
+def iter_sections(path: ReportRef, skip: Iterable[str] = (),
+                  strict: bool = False) -> Iterator[Tuple[str, Any]]:
+    """Yield the top-level ``(key, value)`` members of a JSON object one at a time.
+
+    Members whose key is in `skip` are parsed past without building their
+    values.  Invalid or truncated documents end the iteration, or raise
+    ``ValueError`` when `strict` is true.
+    """
+    skip = set(skip)
+    if not HAVE_IJSON:
+        doc = load_document(path)
+        if doc is None and strict:
+            raise ValueError(f'invalid or unreadable JSON document: {path}')
+        if isinstance(doc, dict):
+            yield from ((k, v) for k, v in doc.items() if k not in skip)
+        return
+    try:
+        with open_report(path) as f:
+            if not skip:
+                yield from ijson.kvitems(f, '', use_float=True)
+                return
+            key, builder, depth, skipping = None, None, 0, False
+            for prefix, event, value in ijson.parse(f, use_float=True):
+                if depth:
+                    if event in ('start_map', 'start_array'):
+                        depth += 1
+                    elif event in ('end_map', 'end_array'):
+                        depth -= 1
+                    if not skipping:
+                        builder.event(event, value)
+                        if not depth:
+                            yield key, builder.value
+                    continue
+                if event == 'map_key' and prefix == '':
+                    key = value
+                elif key is None or prefix == '':
+                    continue  # the top-level object's own start/end events
+                elif event in ('start_map', 'start_array'):
+                    depth, skipping = 1, key in skip
+                    if not skipping:
+                        builder = ijson.ObjectBuilder()
+                        builder.event(event, value)
+                elif key not in skip:
+                    yield key, value
+    except (OSError, ValueError, zipfile.BadZipFile, ijson.JSONError, ijson.IncompleteJSONError):
+        if strict:
+            raise ValueError(f'invalid or truncated JSON document: {path}')
+        return
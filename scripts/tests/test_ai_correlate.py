@@ -0,0 +1,262 @@
+"""Tests for ai_correlate.py (run with `python -m pytest scripts/tests`)."""
+
+import json
+import re
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+for _module in ('orjson', 'tqdm', 'docx'):
+    pytest.importorskip(_module)
+
+import ai_correlate as ac  # noqa: E402
+
+
+class FakeClient:
+    """`chat.completions.create` stub; `reply(prompt)` returns the message content (default: Yes for every ID)."""
+
+    def __init__(self, reply=None):
+        self.prompts = []
+        self.reply = reply or self.answer_all
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, temperature):
+        prompt = messages[-1]['content']
+        self.prompts.append(prompt)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.reply(prompt)))],
+                               usage=None)
+
+    @staticmethod
+    def verdict(puid, status='Yes'):
+        return {'puid': puid, 'status': status, 'severity': 'low', 'rationale': 'checked', 'references': [],
+                'tags': []}
+
+    @classmethod
+    def answer_all(cls, prompt):
+        ids = re.findall(r'^ID: (\S+)', prompt, re.MULTILINE)
+        out = [cls.verdict(i) for i in ids]
+        return json.dumps(out if prompt.lstrip().startswith('REQUISITOS') else out[0])
+
+
+def test_overlapping_matches_of_different_patterns_are_all_counted(tmp_path):
+    src = tmp_path / 'Config.kt'
+    src.write_text('// setup\napi_key = "ALLOW_ALL_HOSTNAME_VERIFIERxxxxxxxx"\n', encoding='utf-8')
+    _, _, _, hits = ac.scan_file(str(src))
+    assert hits == {'hardcoded_key': [2], 'ssl_allow_all': [2]}
+
+
+def test_pipeline_dirs_are_pruned_only_at_the_root(tmp_path):
+    pkg = tmp_path / 'app' / 'src' / 'org' / 'openmrs' / 'module' / 'reports'
+    pkg.mkdir(parents=True)
+    (pkg / 'ReportClient.java').write_text('String u = "http://example.org";\n', encoding='utf-8')
+    (tmp_path / 'reports').mkdir()
+    (tmp_path / 'reports' / 'scan.json').write_text('{"url": "http://example.org"}', encoding='utf-8')
+    (tmp_path / 'app' / 'build').mkdir()
+    (tmp_path / 'app' / 'build' / 'Gen.java').write_text('String u = "http://example.org";\n', encoding='utf-8')
+    res = ac.scan_codebase(tmp_path, workers=1)
+    assert res['files'] == 1
+    assert res['locations']['plaintext_http'] == [
+        str(Path('app/src/org/openmrs/module/reports/ReportClient.java')) + ':1']
+
+
+def _batch_args(tmp_path, manifest):
+    checklist = tmp_path / 'requisitos.json'
+    checklist.write_text('[{"PUID": "SECM-1", "Requirement description": "Use TLS"}]', encoding='utf-8')
+    return ac.build_parser().parse_args(['--checklist', str(checklist), '--manifest', str(manifest),
+                                         '--output-dir', str(tmp_path / 'out' / 'fleet'), '--no-cache'])
+
+
+def test_empty_manifest_writes_an_empty_fleet_report(tmp_path):
+    manifest = tmp_path / 'apps.json'
+    manifest.write_text('[]', encoding='utf-8')
+    assert ac.run_batch(_batch_args(tmp_path, manifest)) == []
+    assert (tmp_path / 'out' / 'fleet' / 'fleet-summary.json').exists()
+
+
+def test_manifest_entries_with_missing_paths_are_flagged(tmp_path):
+    manifest = tmp_path / 'apps.json'
+    manifest.write_text('[{"app": "ghost", "reports": "nope/", "source_root": "."}]', encoding='utf-8')
+    entry, = ac.load_manifest(manifest)
+    assert 'reports=' in entry['error'] and 'source_root' not in entry['error']
+    results = ac.run_batch(_batch_args(tmp_path, manifest))
+    assert results == [{'app': 'ghost', 'error': entry['error']}]
+    assert 'ERROR: path not found' in (tmp_path / 'out' / 'fleet' / 'fleet-summary.md').read_text(encoding='utf-8')
+
+
+def test_batch_profile_path_gets_one_file_per_app(tmp_path, monkeypatch):
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    for app in ('a1', 'a2'):
+        (tmp_path / app).mkdir()
+    manifest = tmp_path / 'apps.json'
+    manifest.write_text('[{"app": "a1", "reports": "a1"}, {"app": "a2", "reports": "a2"}]', encoding='utf-8')
+    args = _batch_args(tmp_path, manifest)
+    args.profile, args.no_history, args.apps_parallel = str(tmp_path / 'prof' / 'run.prof'), True, 1
+    args.cache_dir = str(tmp_path / 'cache')
+    results = ac.run_batch(args)
+    assert all('error' not in r for r in results)
+    assert sorted(p.name for p in (tmp_path / 'prof').iterdir()) == [
+        'run-a1.prof', 'run-a1.txt', 'run-a2.prof', 'run-a2.txt']
+
+
+def test_only_transient_statuses_are_retried():
+    class APIStatusError(Exception):
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+    assert [c for c in (400, 401, 404, 408, 409, 422, 429, 500, 503) if ac._is_retryable(APIStatusError(c))] == \
+        [408, 429, 500, 503]
+
+
+def _findings(prefix, n, size=400):
+    return [{'source': 'sarif', 'rule': f'{prefix}-{i}', 'title': 'x' * size} for i in range(n)]
+
+
+def test_trim_findings_keeps_whole_items_within_budget():
+    found = _findings('r', 15)
+    kept = ac.trim_findings(found)
+    text = json.dumps(kept, ensure_ascii=False)
+    assert 0 < len(kept) < 15 and kept == found[:len(kept)]
+    assert len(text) <= ac.FINDINGS_CHARS and json.loads(text) == kept
+
+
+def test_batch_prompt_lists_each_requirements_own_evidence():
+    shared = {'source': 'trivy', 'rule': 'CVE-2024-0001'}
+    reqs = [{'id': 'SECM-1', 'text': 'Use TLS'}, {'id': 'SECM-2', 'text': 'Protect keys'}]
+    evs = [{'code': {}, 'findings': [shared] + _findings('tls', 3, 10)},
+           {'code': {}, 'findings': _findings('key', 2, 10) + [shared]}]
+    prompt = ac.build_batch_prompt(reqs, evs)
+    assert 'ID: SECM-1\nTexto: Use TLS\nHallazgos relevantes: [0, 1, 2, 3]' in prompt
+    assert 'ID: SECM-2\nTexto: Protect keys\nHallazgos relevantes: [4, 5, 0]' in prompt
+    assert prompt.count('CVE-2024-0001') == 1
+
+
+def test_batches_count_each_requirements_evidence():
+    reqs = [{'id': f'SECM-{i}', 'text': 'short'} for i in range(8)]
+    assert len(ac.make_batches(reqs, 8, 2000)) == 1
+    assert [len(b) for b in ac.make_batches(reqs, 8, 2000, cost=lambda r: 900)] == [2, 2, 2, 2]
+
+
+def test_merged_evidence_interleaves_members_by_rank():
+    merged = ac.merge_evidence([{'findings': _findings('a', 20)}, {'findings': _findings('b', 20)}])
+    kept = ac.trim_findings(merged['findings'])
+    assert {f['rule'] for f in kept[:4]} == {'a-0', 'b-0', 'a-1', 'b-1'}
+
+
+def test_negated_requirements_never_cluster():
+    pos = {'id': 'A', 'text': 'The application must store credentials in the keystore.'}
+    neg = {'id': 'B', 'text': 'The application must not store credentials in the keystore.'}
+    contraction = {'id': 'C', 'text': "The application mustn't store credentials in the keystore."}
+    dup = {'id': 'D', 'text': 'The application must store credentials in the keystore'}
+    for threshold in (0.01, 0.5, 0.99):
+        clusters = ac.cluster_requirements([pos, neg, contraction, dup], threshold)
+        assert [[m['id'] for m, _ in c['members']] for c in clusters] == [['A', 'D'], ['B', 'C']]
+
+
+def test_checkpoint_resume_skips_only_real_verdicts(tmp_path):
+    path = tmp_path / 'audit-findings.jsonl'
+    cp = ac.Checkpoint(path)
+    cp.append(ac.make_finding({'id': 'SECM-1', 'text': 'a'}, FakeClient.verdict('SECM-1')))
+    cp.append(ac.make_finding({'id': 'SECM-2', 'text': 'b'}, {'rationale': 'AI error: RateLimitError'}))
+    cp.append(ac.make_finding({'id': 'SECM-3', 'text': 'c'}, {'rationale': 'No AI available or insufficient inputs.'}))
+    cp.close()
+    with open(path, 'ab') as fh:
+        fh.write(b'{"puid": "SECM-4", "status": "Ye')
+    cp = ac.Checkpoint(path, resume=True)
+    assert path.read_bytes().endswith(b'\n')
+    assert all(json.loads(line) for line in path.read_text(encoding='utf-8').splitlines())
+    assert cp.done() == {'SECM-1'}
+    cp.append(ac.make_finding({'id': 'SECM-2', 'text': 'b'}, FakeClient.verdict('SECM-2', 'No')))
+    cp.close()
+    assert cp.done() == {'SECM-1', 'SECM-2'}
+    assert [f['status'] for f in cp.iter_findings(['SECM-1', 'SECM-2', 'SECM-3'])] == \
+        ['Yes', 'No', 'Insufficient_Evidence']
+
+
+def _audit(tmp_path, monkeypatch, client, *extra):
+    for d in ('reports', 'src'):
+        (tmp_path / d).mkdir(exist_ok=True)
+    monkeypatch.setattr(ac, 'build_openai', lambda: client)
+    args = ac.build_parser().parse_args(['--checklist', 'unused', '--reports', str(tmp_path / 'reports'),
+                                         '--output-dir', str(tmp_path / 'out'), '--no-cache', '--no-history',
+                                         '--rpm', '0', '--tpm', '0', *extra])
+    reqs = [{'id': f'SECM-{i}', 'text': f'Requirement number {i}'} for i in range(1, 6)]
+    return ac.audit_app(args, 'app', reqs, tmp_path / 'reports', tmp_path / 'src', tmp_path / 'out', None)
+
+
+def test_resume_reevaluates_fallback_verdicts(tmp_path, monkeypatch):
+    first = _audit(tmp_path, monkeypatch, None)
+    assert set(first['statuses'].values()) == {'Insufficient_Evidence'}
+    with open(tmp_path / 'out' / 'audit-findings.jsonl', 'ab') as fh:
+        fh.write(b'{"puid": "SECM-1", "status": "Ye')
+    client = FakeClient()
+    second = _audit(tmp_path, monkeypatch, client, '--resume')
+    assert len(client.prompts) == 5
+    assert set(second['statuses'].values()) == {'Yes'}
+
+
+def test_missing_previous_is_an_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['ai_correlate.py', '--checklist', 'x', '--reports', str(tmp_path),
+                                      '--output-dir', str(tmp_path / 'out'), '--previous', str(tmp_path / 'typo.json')])
+    with pytest.raises(SystemExit) as exc:
+        ac.main()
+    assert exc.value.code == 2
+
+
+def test_unreadable_previous_warns(tmp_path, monkeypatch, capsys):
+    (tmp_path / 'prev.json').write_text('not json', encoding='utf-8')
+    _audit(tmp_path, monkeypatch, FakeClient(), '--previous', str(tmp_path / 'prev.json'))
+    assert 'no findings could be read' in capsys.readouterr().err
+
+
+def test_delta_lists_reused_puids(tmp_path, monkeypatch):
+    _audit(tmp_path, monkeypatch, FakeClient())
+    prev = tmp_path / 'prev.json'
+    prev.write_bytes((tmp_path / 'out' / 'audit-findings.json').read_bytes())
+    client = FakeClient()
+    _audit(tmp_path, monkeypatch, client, '--previous', str(prev))
+    delta = json.loads((tmp_path / 'out' / 'audit-delta.json').read_text(encoding='utf-8'))
+    assert client.prompts == []
+    assert delta['reused_puids'] == [f'SECM-{i}' for i in range(1, 6)]
+    assert delta['recomputed_puids'] == {}
+
+
+BATCH_REQS = [{'id': f'SECM-{i}', 'text': f'Requirement number {i}'} for i in range(1, 7)]
+
+
+def _partial_batch_reply(prompt):
+    if not prompt.lstrip().startswith('REQUISITOS'):
+        return FakeClient.answer_all(prompt)
+    return json.dumps([
+        FakeClient.verdict('SECM-1'),
+        FakeClient.verdict('SECM-2'), FakeClient.verdict('SECM-2', 'No'),  # duplicate: ambiguous
+        # SECM-3 missing
+        FakeClient.verdict('SECM-4', 'Maybe'),                              # invalid status
+        FakeClient.verdict('SECM-5', 'n/a'),                                # normalized to N_a
+        'SECM-6: Yes',                                                      # not an object
+        FakeClient.verdict('SECM-99'),                                      # not in the batch
+    ])
+
+
+def test_batch_keeps_only_valid_verdicts():
+    evs = [{'findings': []} for _ in BATCH_REQS]
+    got = ac.ask_llm_batch(FakeClient(_partial_batch_reply), 'm', BATCH_REQS, evs)
+    assert {p: v['status'] for p, v in got.items()} == {'SECM-1': 'Yes', 'SECM-5': 'N_a'}
+    wrapped = ac.ask_llm_batch(FakeClient(lambda p: json.dumps({'verdicts': [FakeClient.verdict('SECM-3')]})),
+                               'm', BATCH_REQS, evs)
+    assert list(wrapped) == ['SECM-3']
+    assert ac.ask_llm_batch(FakeClient(lambda p: 'Sorry, I cannot help'), 'm', BATCH_REQS, evs) == {}
+
+
+def test_batch_falls_back_to_single_calls_for_rejected_entries():
+    client, counters = FakeClient(_partial_batch_reply), {}
+    verdicts = ac.evaluate_requirements(client, 'm', BATCH_REQS, lambda r: {'findings': []}, concurrency=1,
+                                        batch_size=6, batch_tokens=10_000, counters=counters)
+    singles = [re.search(r'^ID: (\S+)', p, re.MULTILINE).group(1) for p in client.prompts[1:]]
+    assert sorted(singles) == ['SECM-2', 'SECM-3', 'SECM-4', 'SECM-6']
+    assert counters['batch_calls'] == 1 and counters['batch_fallbacks'] == 4 and counters['llm_calls'] == 5
+    assert [v['puid'] for v in verdicts] == [r['id'] for r in BATCH_REQS]
+    assert [v['status'] for v in verdicts] == ['Yes', 'Yes', 'Yes', 'Yes', 'N_a', 'Yes']
@@ -0,0 +1,59 @@
+"""Tests for the MobSF normalization in findings.py (run with `python -m pytest scripts/tests`)."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from findings import FindingSet, from_mobsf, iter_mobsf_issues, mobsf_location  # noqa: E402
+
+
+def test_mobsf_location_shapes():
+    assert mobsf_location({'file': './app/src/Main.java', 'line': 12}) == 'app/src/Main.java:12'
+    assert mobsf_location({'component': 'org.openmrs.mobile.MainActivity'}) == 'org.openmrs.mobile.MainActivity'
+    assert mobsf_location({'files': {'app/src/Db.java': '40,41,90'}}) == 'app/src/Db.java:40'
+    assert mobsf_location({'location': 'app/src/Db.java:40'}) == 'app/src/Db.java:40'
+    assert mobsf_location({'title': 'no location'}) == ''
+
+
+def test_distinct_dynamic_issues_keep_distinct_fingerprints():
+    found = FindingSet()
+    for i in range(50):
+        found.add(from_mobsf({'title': f'Insecure call {i}', 'severity': 'high'}, 'dynamic', 'api_monitor'))
+    assert len(found) == 50
+
+
+def test_code_analysis_rules_with_same_cwe_keep_their_files():
+    found = FindingSet()
+    for i in range(20):
+        found.add(from_mobsf({'files': {f'app/src/File{i}.java': '7'},
+                              'metadata': {'severity': 'warning', 'description': 'Weak hash',
+                                           'cwe': 'CWE-327: Broken crypto'}},
+                             'static', f'android_md5_{i}'))
+    assert len(found) == 20
+    assert {f.key for f in found} == {'CWE-327'}
+
+
+def test_same_issue_twice_is_merged():
+    issue = {'title': 'App allows cleartext traffic', 'severity': 'high', 'component': 'application'}
+    found = FindingSet()
+    assert found.add(from_mobsf(issue, 'static', 'manifest_analysis'))
+    assert not found.add(from_mobsf(dict(issue), 'static', 'network_security'))
+    assert len(found) == 1 and next(iter(found)).count == 2
+
+
+def test_rule_falls_back_to_title_not_section_key():
+    f = from_mobsf({'title': 'Debug enabled', 'severity': 'high'}, 'static', 'manifest_analysis')
+    assert f.rule == 'Debug enabled'
+    assert from_mobsf({'rule': 'android_debug', 'title': 'Debug enabled', 'severity': 'high'}).rule == 'android_debug'
+
+
+def test_iter_mobsf_issues_is_iterative_and_skips_blobs():
+    deep = {'title': 'deep', 'severity': 'high'}
+    for _ in range(5000):
+        deep = {'nested': [deep]}
+    section = {'deep': deep, 'certificate_info': {'title': 'not an issue', 'severity': 'high'},
+               'rule_1': {'files': {'A.java': '1'}, 'metadata': {'severity': 'info', 'description': 'Logs'}}}
+    issues = list(iter_mobsf_issues(section, 'code_analysis'))
+    assert [(k, i.get('title') or i['metadata']['description']) for k, i in issues] == \
+        [('nested', 'deep'), ('rule_1', 'Logs')]
@@ -0,0 +1,94 @@
+"""Tests for recolectar_datos.py (run with `python -m pytest scripts/tests`)."""
+
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import recolectar_datos as rd  # noqa: E402
+
+
+def test_record_history_keeps_mobsf_locations(tmp_path):
+    report = tmp_path / 'mobsf_results.json'
+    report.write_text(json.dumps({
+        'code_analysis': {f'android_logging_{i}': {
+            'files': {f'app/src/Log{i}.java': '3,9'},
+            'metadata': {'severity': 'info', 'description': 'The App logs information', 'cwe': 'CWE-532'}}
+            for i in range(5)},
+        'manifest_analysis': [{'title': 'Debug enabled', 'severity': 'high', 'component': 'application'}],
+    }), encoding='utf-8')
+    mobsf = rd.parse_mobsf_results(str(report))
+    assert len(mobsf) == 6
+
+    store = tmp_path / 'history.sqlite'
+    rd.record_history(str(store), {'SECM-1': True}, [], [], mobsf)
+    rows = sqlite3.connect(str(store)).execute('SELECT fingerprint, location FROM findings').fetchall()
+    assert len(rows) == 6
+    assert len({fp for fp, _ in rows}) == 6
+    assert {loc for _, loc in rows} == {f'app/src/Log{i}.java:3' for i in range(5)} | {'application'}
+
+
+def _input():
+    return {
+        'compliance': {'SECM-1': True},
+        'tls_enabled': False,
+        'container_scan_vulnerabilities': [
+            {'id': 'CVE-2024-0001', 'severity': 'LOW'},
+            {'id': 'CVE-2024-0001', 'severity': 'CRITICAL'},
+            {'id': 'CVE-2024-0002', 'severity': 'MEDIUM'},
+            {'id': 'CVE-2024-0003', 'severity': 'LOW'},
+        ],
+        'dependency_vulnerabilities': [{'VulnerabilityID': 'GHSA-aaaa-bbbb-cccc', 'Severity': 'moderate'}, 'junk'],
+        'mobsf_vulnerabilities': [{'title': 'Debug enabled', 'severity': 'warning', 'location': 'application'}],
+    }
+
+
+def test_summarize_vulnerabilities_histogram_and_highest_severity_wins():
+    summary, by_id = rd.summarize_vulnerabilities(_input()['container_scan_vulnerabilities'])
+    assert summary == {'total': 4, 'max_severity': 'critical',
+                       'by_severity': {'critical': 1, 'high': 0, 'medium': 1, 'low': 2, 'info': 0, 'unknown': 0}}
+    assert by_id == {'CVE-2024-0001': 'critical', 'CVE-2024-0002': 'medium', 'CVE-2024-0003': 'low'}
+    assert rd.summarize_vulnerabilities([])[0]['max_severity'] == 'none'
+
+
+def test_compact_input_keeps_lists_and_adds_indexes():
+    out = rd.compact_input(_input())
+    assert out['container_scan_vulnerabilities'] == _input()['container_scan_vulnerabilities']
+    assert out['vulnerability_index'] == {
+        'container_scan': {'CVE-2024-0001': 'critical', 'CVE-2024-0002': 'medium', 'CVE-2024-0003': 'low'},
+        'dependency': {'GHSA-aaaa-bbbb-cccc': 'medium'},
+        'mobsf': {'Debug enabled': 'medium'}}
+    assert out['vulnerability_summary']['dependency']['total'] == 1
+
+
+def test_data_dir_layout(tmp_path):
+    data = _input()
+    out = rd.compact_input(data, str(tmp_path / 'opa-data'))
+    assert sorted(out) == ['compliance', 'tls_enabled', 'vulnerability_summary']
+    assert sorted(out['vulnerability_summary']) == ['container_scan', 'dependency', 'mobsf']
+    docs = {p.parent.name: json.loads(p.read_text(encoding='utf-8'))
+            for p in (tmp_path / 'opa-data' / 'vulnerabilities').glob('*/data.json')}
+    assert sorted(docs) == ['container_scan', 'dependency', 'mobsf']
+    assert docs['container_scan'] == {
+        'by_id': {'CVE-2024-0001': 'critical', 'CVE-2024-0002': 'medium', 'CVE-2024-0003': 'low'},
+        'items': data['container_scan_vulnerabilities']}
+    assert docs['mobsf']['items'] == data['mobsf_vulnerabilities']
+    assert 'container_scan_vulnerabilities' in data  # the caller's dict is not modified
+
+
+def test_main_compact_output_is_minified(tmp_path, monkeypatch):
+    (tmp_path / 'requirements').mkdir()
+    (tmp_path / 'requirements' / 'requisitos.json').write_text(
+        '[{"PUID": "SECM-1", "Requirement description": "Use TLS"}]', encoding='utf-8')
+    (tmp_path / 'trivy_results.json').write_text(json.dumps({'Results': [{'Target': 'app', 'Vulnerabilities': [
+        {'VulnerabilityID': 'CVE-2024-0001', 'Severity': 'HIGH'}]}]}), encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, 'argv', ['recolectar_datos.py', '--compact', '--data-dir', 'opa-data'])
+    rd.main()
+    text = (tmp_path / 'input.json').read_text(encoding='utf-8')
+    assert '\n' not in text and ': ' not in text
+    assert json.loads(text)['vulnerability_summary']['container_scan']['by_severity']['high'] == 1
+    doc = json.loads((tmp_path / 'opa-data' / 'vulnerabilities' / 'container_scan' / 'data.json').read_text())
+    assert doc == {'by_id': {'CVE-2024-0001': 'high'}, 'items': [{'id': 'CVE-2024-0001', 'severity': 'HIGH'}]}